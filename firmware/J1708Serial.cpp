@@ -10,6 +10,10 @@ static Queue<J1708Msg>      _txMsgs(J1708_MSG_QUEUE_DEPTH);
 static OneShotHardwareTimer _EOMTimer(J1708_EOM_TIMER);
 static OneShotHardwareTimer _COLTimer(J1708_COL_TIMER);
 
+/* The time the first character of the message currently being received
+ * arrived */
+static volatile uint32_t    _rxStart = 0;
+
 /* The timer source is rcc_apb1_frequency * 2, we want to ensure that the
  * prescaler allows for accurately counting 9600 baud signals and also fits
  * within a 16-bit value, so set the frequency to be 48khz. This will count
@@ -226,6 +230,11 @@ void J1708Serial::_rx_complete_irq(serial_t *obj) {
     unsigned char c;
 
     if (uart_getc(obj, &c) == 0) {
+        /* If the receive buffer is empty this is the start of a new message,
+         * save the time so the host can get accurate message timing. */
+        if (obj->rx_head == obj->rx_tail) {
+            _rxStart = micros();
+        }
 
         uint16_t i = (obj->rx_head + 1) % SERIAL_RX_BUFFER_SIZE;
         if (i != obj->rx_tail) {
@@ -286,6 +295,7 @@ void J1708Serial::_eomCallback(void) {
         J1708Msg msg;
         memcpy(msg.buf, _serialPtr->rx_buff, avail);
         msg.len = avail;
+        msg.time = _rxStart;
         _rxMsgs.enqueue(&msg);
 
         /* Reset head and tail back to 0 just to make life easier in the
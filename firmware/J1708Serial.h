@@ -43,6 +43,9 @@ const uint32_t J1708_MSG_MIN_SIZE = 2;
 typedef struct {
     uint8_t buf[J1708_MSG_MAX_SIZE];
     uint32_t len;
+
+    /* micros() when the first character of a received message arrived */
+    uint32_t time;
 } J1708Msg;
 
 /* Assuming things work properly the message queues shouldn't need to be be very 
@@ -6,6 +6,39 @@
 const char HOST_MSG_START = '$';
 const char HOST_MSG_END   = '*';
 
+/* Host commands are sent as "#<cmd>*" in hex mode.  In binary mode commands
+ * are sent as a frame with a length of 0 followed by the command character.
+ * Commands are acknowledged by echoing the command back to the host (in the
+ * current mode) before the mode is changed. */
+const char HOST_CMD_START  = '#';
+const char HOST_CMD_BINARY = 'B';
+const char HOST_CMD_HEX    = 'H';
+const char HOST_CMD_TIMESTAMPS    = 'T';
+const char HOST_CMD_NO_TIMESTAMPS = 't';
+
+/* When timestamps are enabled each message sent to the host is followed by the
+ * micros() value when the message started: 8 hex characters (most significant
+ * first) in hex mode, or 4 bytes (least significant first) after the message
+ * in binary mode.  The timestamp is not included in the binary length byte. */
+const uint32_t HOST_TIMESTAMP_SIZE = 8;
+const uint32_t BIN_TIMESTAMP_SIZE  = 4;
+bool timestampsEnabled = false;
+
+/* In binary mode each frame is COBS encoded and terminated by a 0 byte.  The
+ * decoded frame is a length byte followed by the J1708 message.  For frames
+ * this small COBS adds 1 byte of overhead. */
+const uint8_t  BIN_FRAME_END      = 0x00;
+const uint32_t BIN_FRAME_MAX_SIZE = J1708_MSG_MAX_SIZE + 1 + BIN_TIMESTAMP_SIZE;
+const uint32_t BIN_MSG_MAX_SIZE   = BIN_FRAME_MAX_SIZE + 1;
+
+/* The tool always starts in hex mode */
+bool binaryMode = false;
+
+/* Set while the host has the port open (DTR asserted).  When a host opens the
+ * port the host protocol is reset to hex mode without timestamps so a mode
+ * left enabled by the previous host program doesn't confuse the next one. */
+bool hostConnected = false;
+
 /* The host messages are sent in printed hex so there are 2x as many characters 
  * for host messages as the max J1708 message. Also 2 characters are needed for 
  * the start/end of message delimiters. */
@@ -53,9 +86,24 @@ bool isValidHostMsg(char *buf, uint32_t len) {
 }
 
 void printMsgToHost(J1708Msg src) {
-    char out[HOST_MSG_BUF_SIZE];
+    char out[HOST_MSG_BUF_SIZE + HOST_TIMESTAMP_SIZE];
     int outIdx;
 
+    if (binaryMode) {
+        uint8_t data[J1708_MSG_MAX_SIZE + BIN_TIMESTAMP_SIZE];
+        uint32_t dataLen = src.len;
+
+        memcpy(data, src.buf, src.len);
+        if (timestampsEnabled) {
+            for (uint32_t i = 0; i < BIN_TIMESTAMP_SIZE; i++) {
+                data[dataLen++] = (src.time >> (i * 8)) & 0xFF;
+            }
+        }
+
+        printBinFrameToHost(src.len, data, dataLen);
+        return;
+    }
+
     out[0] = HOST_MSG_START;
     outIdx = 1;
 
@@ -65,11 +113,114 @@ void printMsgToHost(J1708Msg src) {
         outIdx += 2;
     }
 
+    if (timestampsEnabled) {
+        for (int shift = 28; shift >= 0; shift -= 4) {
+            out[outIdx++] = nibble_to_char((src.time >> shift) & 0x0F);
+        }
+    }
+
     out[outIdx++] = HOST_MSG_END;
     out[outIdx] = '\0';
     SerialUSB.print(out);
 }
 
+/* COBS encode len bytes of src into dst.  dst must be at least len + 1 bytes.
+ * Returns the number of encoded bytes, not including the frame delimiter. */
+uint32_t cobsEncode(const uint8_t *src, uint32_t len, uint8_t *dst) {
+    uint32_t codeIdx = 0;
+    uint32_t outIdx = 1;
+    uint8_t code = 1;
+
+    for (uint32_t i = 0; i < len; i++) {
+        if (src[i] == 0) {
+            dst[codeIdx] = code;
+            codeIdx = outIdx++;
+            code = 1;
+        } else {
+            dst[outIdx++] = src[i];
+            code++;
+            if (code == 0xFF) {
+                dst[codeIdx] = code;
+                codeIdx = outIdx++;
+                code = 1;
+            }
+        }
+    }
+    dst[codeIdx] = code;
+
+    return outIdx;
+}
+
+/* COBS decode len bytes of src into dst.  Returns the number of decoded bytes
+ * or 0 if the frame is invalid or too large for dst. */
+uint32_t cobsDecode(const uint8_t *src, uint32_t len, uint8_t *dst, uint32_t dstSize) {
+    uint32_t inIdx = 0;
+    uint32_t outIdx = 0;
+
+    while (inIdx < len) {
+        uint8_t code = src[inIdx++];
+        if ((code == 0) || ((inIdx + code - 1) > len)) {
+            return 0;
+        }
+
+        for (uint8_t i = 1; i < code; i++) {
+            if (outIdx >= dstSize) {
+                return 0;
+            }
+            dst[outIdx++] = src[inIdx++];
+        }
+
+        if ((code != 0xFF) && (inIdx < len)) {
+            if (outIdx >= dstSize) {
+                return 0;
+            }
+            dst[outIdx++] = 0;
+        }
+    }
+
+    return outIdx;
+}
+
+/* Send a binary mode frame: a length byte followed by len bytes of data.
+ * A length of 0 indicates a command frame. */
+void printBinFrameToHost(uint8_t length, const uint8_t *data, uint32_t len) {
+    uint8_t frame[BIN_FRAME_MAX_SIZE];
+    uint8_t out[BIN_MSG_MAX_SIZE + 1];
+    uint32_t outLen;
+
+    frame[0] = length;
+    memcpy(&frame[1], data, len);
+
+    outLen = cobsEncode(frame, len + 1, out);
+    out[outLen++] = BIN_FRAME_END;
+    SerialUSB.write(out, outLen);
+}
+
+void sendCmdAck(char cmd) {
+    if (binaryMode) {
+        printBinFrameToHost(0, (const uint8_t *)&cmd, 1);
+    } else {
+        char out[4] = {HOST_CMD_START, cmd, HOST_MSG_END, '\0'};
+        SerialUSB.print(out);
+    }
+}
+
+void handleHostCmd(char cmd) {
+    if (cmd == HOST_CMD_BINARY) {
+        sendCmdAck(cmd);
+        binaryMode = true;
+    } else if (cmd == HOST_CMD_HEX) {
+        sendCmdAck(cmd);
+        binaryMode = false;
+    } else if (cmd == HOST_CMD_TIMESTAMPS) {
+        sendCmdAck(cmd);
+        timestampsEnabled = true;
+    } else if (cmd == HOST_CMD_NO_TIMESTAMPS) {
+        sendCmdAck(cmd);
+        timestampsEnabled = false;
+    }
+}
+
 J1708Msg hostToJ1708Msg(char *buf, uint32_t len) {
     J1708Msg msg;
     if (isValidHostMsg(buf, len)) {
@@ -107,6 +258,96 @@ char incoming[HOST_MSG_BUF_SIZE];
 uint32_t received = 0;
 uint32_t last = 0;
 
+void handleHexChar(char readChar) {
+    J1708Msg tmp;
+
+    if ((readChar == HOST_MSG_START) || (readChar == HOST_CMD_START)) {
+        /* If this is the start of message (or command) character reset the
+         * received characters back to 0. */
+        received = 0;
+        incoming[received++] = readChar;
+    } else if ((received > 0) && (received < HOST_MSG_BUF_SIZE)) {
+        /* If a message has already started append to the incoming message 
+         * buffer. */
+        incoming[received++] = readChar;
+
+        if (readChar == HOST_MSG_END) {
+#ifdef J1708_TX_DEBUG
+            incoming[received] = '\0';
+            SerialUSB.print("\nValidating: ");
+            SerialUSB.print(incoming);
+            SerialUSB.println();
+#endif
+
+            if ((incoming[0] == HOST_CMD_START) && (received == 3)) {
+                handleHostCmd(incoming[1]);
+            } else if (isValidHostMsg(incoming, received)) {
+                /* If this is the end of message character check if this is 
+                 * a valid message or not */
+                tmp = hostToJ1708Msg(incoming, received);
+                bus.msgSend(tmp);
+            }
+
+            /* Regardless of if this is a valid message or not clear the 
+             * host message buffer. */
+            received = 0;
+        }
+    } else if (received >= HOST_MSG_BUF_SIZE) {
+#ifdef J1708_TX_DEBUG
+        incoming[HOST_MSG_BUF_SIZE - 1] = '\0';
+        SerialUSB.print("\nInvalid msg: ");
+        SerialUSB.print(incoming);
+        SerialUSB.println();
+#endif
+
+        /* clear the host msg buffer */
+        received = 0;
+    } else {
+#ifdef J1708_TX_DEBUG
+        SerialUSB.print("\nInvalid SOM: ");
+        SerialUSB.print(readChar);
+        SerialUSB.print(" (0x");
+        SerialUSB.print(readChar, HEX);
+        SerialUSB.println(")");
+#endif
+    }
+}
+
+void handleBinChar(uint8_t readChar) {
+    J1708Msg tmp;
+    uint8_t frame[BIN_FRAME_MAX_SIZE];
+    uint32_t frameLen;
+
+    if (readChar != BIN_FRAME_END) {
+        /* Frames that are too large are discarded when the end of frame is
+         * received. */
+        if (received < HOST_MSG_BUF_SIZE) {
+            incoming[received] = readChar;
+        }
+        received++;
+        return;
+    }
+
+    if ((received > 0) && (received <= BIN_MSG_MAX_SIZE)) {
+        frameLen = cobsDecode((uint8_t *)incoming, received, frame, sizeof(frame));
+
+        /* The frame buffer also has room for a timestamp, so a frame can be
+         * longer than a J1708 message.  Messages that don't fit in the message
+         * buffer are discarded. */
+        if ((frameLen == 2) && (frame[0] == 0)) {
+            handleHostCmd(frame[1]);
+        } else if ((frameLen >= (J1708_MSG_MIN_SIZE + 1))
+                   && (frame[0] <= J1708_MSG_MAX_SIZE)
+                   && (frame[0] == (frameLen - 1))) {
+            memcpy(tmp.buf, &frame[1], frame[0]);
+            tmp.len = frame[0];
+            bus.msgSend(tmp);
+        }
+    }
+
+    received = 0;
+}
+
 void loop(void) {
     J1708Msg tmp;
     char readChar;
@@ -119,56 +360,22 @@ void loop(void) {
         last = now;
     }
 
+    /* Reset the host protocol when the host (re)connects */
+    bool connected = SerialUSB.dtr();
+    if (connected && !hostConnected) {
+        binaryMode = false;
+        timestampsEnabled = false;
+        received = 0;
+    }
+    hostConnected = connected;
+
     /* See if there is any incoming USB data */
     if (SerialUSB.available()) {
         readChar = SerialUSB.read();
-        if (readChar == HOST_MSG_START) {
-            /* If this is the start of message character reset the received 
-             * characters back to 0. */
-            received = 0;
-            incoming[received++] = readChar;
-        } else if ((received > 0) && (received < HOST_MSG_BUF_SIZE)) {
-            /* If a message has already started append to the incoming message 
-             * buffer. */
-            incoming[received++] = readChar;
-
-            if (readChar == HOST_MSG_END) {
-#ifdef J1708_TX_DEBUG
-                incoming[received] = '\0';
-                SerialUSB.print("\nValidating: ");
-                SerialUSB.print(incoming);
-                SerialUSB.println();
-#endif
-
-                /* If this is the end of message character check if this is 
-                 * a valid message or not */
-                if (isValidHostMsg(incoming, received)) {
-                    tmp = hostToJ1708Msg(incoming, received);
-                    bus.msgSend(tmp);
-                }
-
-                /* Regardless of if this is a valid message or not clear the 
-                 * host message buffer. */
-                received = 0;
-            }
-        } else if (received >= HOST_MSG_BUF_SIZE) {
-#ifdef J1708_TX_DEBUG
-            incoming[HOST_MSG_BUF_SIZE - 1] = '\0';
-            SerialUSB.print("\nInvalid msg: ");
-            SerialUSB.print(incoming);
-            SerialUSB.println();
-#endif
-
-            /* clear the host msg buffer */
-            received = 0;
+        if (binaryMode) {
+            handleBinChar((uint8_t)readChar);
         } else {
-#ifdef J1708_TX_DEBUG
-            SerialUSB.print("\nInvalid SOM: ");
-            SerialUSB.print(readChar);
-            SerialUSB.print(" (0x");
-            SerialUSB.print(readChar, HEX);
-            SerialUSB.println(")");
-#endif
+            handleHexChar(readChar);
         }
     } /* if (SerialUSB.available()) */
 
@@ -1,6 +1,24 @@
+import importlib
+
 from .iface import *
 from .msg import *
+from .multisection import *
 from .pids import J1708PID
 from .mids import J1708MID
-from .pid_types import *
 from .exceptions import *
+
+
+def __getattr__(name):
+    # The PID types are only imported the first time one of them is used 
+    # because loading them (and the PID information tables) is slow
+    pid_types = importlib.import_module('.pid_types', __name__)
+    if name == '__all__':
+        return [n for n in globals() if not n.startswith('_') and n != 'importlib'] + pid_types.__all__
+    if name in pid_types.__all__:
+        return getattr(pid_types, name)
+    raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
+
+
+def __dir__():
+    pid_types = importlib.import_module('.pid_types', __name__)
+    return sorted(set(globals()) | set(pid_types.__all__))
@@ -0,0 +1,266 @@
+"""
+Decode large numbers of J1708 messages into NumPy arrays.
+
+Creating a J1708 object for every message is too slow when analysing large
+captures.  decode_batch() takes all of the messages packed into one buffer and
+returns the values of each (MID, PID) as columns:
+
+    buf, offsets = pack_frames(msgs)
+    columns = decode_batch(buf, offsets, timestamps)
+    times, speeds = columns[(128, 84)]
+
+Checksums are validated and fixed width (1 and 2 byte) PIDs with a numeric
+resolution are decoded for all messages at once, the values of these PIDs are
+float arrays with NaN for values that are not available.  All other PIDs are
+decoded with pids.decode_from() and their values are object arrays.
+
+Requires NumPy (pip install j1708[batch]).
+"""
+
+try:
+    import numpy as np
+except ImportError as e:
+    raise ImportError('j1708.batch requires numpy, install it with "pip install j1708[batch]"') from e
+
+from fractions import Fraction
+
+from . import pids as j1708_pids
+from . import metadata
+from .exceptions import *
+
+
+# Per-PID tables for the PIDs that can be decoded directly into arrays, 
+# indexed by PID.  Built the first time they are used.
+_tables = None
+
+
+def _build_tables():
+    global _tables
+
+    scaled = np.zeros(1024, dtype=bool)
+    signed = np.zeros(1024, dtype=bool)
+    num = np.ones(1024, dtype=np.int64)
+    den = np.ones(1024, dtype=np.int64)
+
+    for pid in range(1024):
+        # Only 1 and 2 byte PIDs have a fixed width
+        if pid % 256 >= 192:
+            continue
+
+        try:
+            info = metadata.get_pid_info(pid)
+        except KeyError:
+            continue
+
+        resolution = info.get('resolution')
+        if isinstance(resolution, Fraction):
+            scaled[pid] = True
+            signed[pid] = info['type'].startswith('signed')
+            num[pid] = resolution.numerator
+            den[pid] = resolution.denominator
+
+    _tables = (scaled, signed, num, den)
+    return _tables
+
+
+def pack_frames(msgs):
+    """
+    Pack a list of messages into a single buffer, returns the buffer and an
+    array of the offsets of each message followed by the length of the buffer.
+    """
+    offsets = np.zeros(len(msgs) + 1, dtype=np.int64)
+    np.cumsum([len(m) for m in msgs], out=offsets[1:])
+    return b''.join(msgs), offsets
+
+
+class BatchDecoder:
+    """
+    Decodes messages that are packed into a single buffer (see pack_frames()).
+
+    Counters:
+        frames:             number of messages processed
+        checksum_errors:    number of messages discarded because of an invalid
+                            checksum
+        decode_errors:      number of messages discarded because they could not
+                            be decoded
+    """
+    def __init__(self, ignore_checksum=False):
+        self.ignore_checksum = ignore_checksum
+
+        self.frames = 0
+        self.checksum_errors = 0
+        self.decode_errors = 0
+
+    def decode(self, buf, offsets, timestamps=None):
+        """
+        Decode the messages in buf, message i is buf[offsets[i]:offsets[i+1]]
+        and includes the checksum.  Returns a dict of (MID, PID) -> (times,
+        values) arrays, if timestamps are not provided the message index is
+        used as the time.
+        """
+        scaled, signed, num, den = _tables or _build_tables()
+
+        raw = bytes(buf)
+        offsets = np.asarray(offsets, dtype=np.int64)
+        count = len(offsets) - 1
+        if count < 0 or (count and offsets[-1] > len(raw)):
+            raise J1708Error(f'Invalid offsets for {len(raw)} byte buffer')
+
+        if timestamps is None:
+            timestamps = np.arange(count, dtype=np.float64)
+        else:
+            timestamps = np.asarray(timestamps, dtype=np.float64)
+            if len(timestamps) != count:
+                raise J1708Error(f'{len(timestamps)} timestamps provided for {count} messages')
+
+        # Pad the data so the PID header bytes can be read without checking 
+        # for the end of the buffer first, the message end is checked instead
+        data = np.frombuffer(raw + b'\x00' * 4, dtype=np.uint8)
+
+        starts = offsets[:-1]
+        ends = offsets[1:]
+        lengths = ends - starts
+
+        # A valid message sums to 0 (including the checksum)
+        valid = lengths >= 2
+        if not self.ignore_checksum:
+            sums = np.zeros(len(raw) + 1, dtype=np.int64)
+            np.cumsum(data[:len(raw)], out=sums[1:])
+            valid &= ((sums[ends] - sums[starts]) & 0xFF) == 0
+        self.frames += count
+        self.checksum_errors += int(count - np.count_nonzero(valid))
+
+        # The PIDs of all messages are decoded at the same time, one PID from 
+        # each message per pass.  The last byte of each message is the 
+        # checksum.
+        mids = data[starts]
+        frame_idx = np.nonzero(valid & (lengths > 2))[0]
+        pos = starts[frame_idx] + 1
+        msg_end = ends[frame_idx] - 1
+        bad = np.zeros(count, dtype=bool)
+
+        numeric = []
+        other = {}
+        while len(frame_idx):
+            avail = msg_end - pos
+            b0 = data[pos] == 0xff
+            b1 = data[pos + 1] == 0xff
+            b2 = data[pos + 2] == 0xff
+
+            # Extended PIDs are prefixed by one 0xFF for each page
+            page3 = (avail >= 4) & b0 & b1 & b2
+            page2 = ~page3 & (avail >= 3) & b0 & b1
+            page1 = ~page3 & ~page2 & (avail >= 2) & b0
+            page = page1 * 1 + page2 * 2 + page3 * 3
+            ok = page3 | page2 | page1 | ((avail >= 1) & ~b0)
+
+            pid_char = data[pos + page].astype(np.int64)
+            pid = page * 256 + pid_char
+            start = pos + page + 1
+
+            data_len = np.where(pid_char < 128, 1, 2)
+            rest = pid_char == 254
+            data_len = np.where(rest, msg_end - start, data_len)
+
+            # Variable length PIDs start with the length of the data
+            variable = (pid_char >= 192) & ~rest
+            ok &= ~variable | (start < msg_end)
+            start = start + variable
+            data_len = np.where(variable, data[start - 1], data_len)
+
+            end = start + data_len
+            ok &= end <= msg_end
+
+            bad[frame_idx[~ok]] = True
+            frame_idx, pos, pid, start, end, data_len, msg_end = (
+                    a[ok] for a in (frame_idx, pos, pid, start, end, data_len, msg_end))
+
+            # Decode the fixed width numeric PIDs
+            direct = scaled[pid]
+            if np.any(direct):
+                d_pid = pid[direct]
+                d_start = start[direct]
+                two = data_len[direct] == 2
+
+                value = data[d_start].astype(np.int64)
+                value |= np.where(two, data[d_start + 1], 0).astype(np.int64) << 8
+                unavailable = value == np.where(two, 0xffff, 0xff)
+
+                sign_bit = np.where(two, 0x8000, 0x80)
+                negative = signed[d_pid] & (value >= sign_bit)
+                value = np.where(negative, value - (sign_bit << 1), value)
+
+                # raw * num and den are exact as floats so this is rounded the 
+                # same way as the integer division used by pids.decode_from()
+                value = (value * num[d_pid]).astype(np.float64) / den[d_pid]
+                value[unavailable] = np.nan
+
+                numeric.append((frame_idx[direct], d_pid, value))
+
+            # Everything else is decoded the normal way
+            fallback = ~direct
+            for idx, p, offset, m_end in zip(frame_idx[fallback].tolist(), pid[fallback].tolist(),
+                                             pos[fallback].tolist(), msg_end[fallback].tolist()):
+                try:
+                    param, _ = j1708_pids.decode_from(raw, offset, m_end)
+                except Exception:
+                    # One message that can't be decoded shouldn't stop the 
+                    # rest of the batch from being decoded
+                    bad[idx] = True
+                    continue
+                other.setdefault((int(mids[idx]), p), []).append((idx, param.value))
+
+            pos = end
+            more = pos < msg_end
+            frame_idx, pos, msg_end = frame_idx[more], pos[more], msg_end[more]
+
+        self.decode_errors += int(np.count_nonzero(bad))
+        return self._columns(numeric, other, mids, bad, timestamps)
+
+    @staticmethod
+    def _columns(numeric, other, mids, bad, timestamps):
+        # Values from messages that could not be decoded are discarded
+        columns = {}
+        if numeric:
+            idx, pid, value = (np.concatenate(a) for a in zip(*numeric))
+            keep = ~bad[idx]
+            idx, pid, value = idx[keep], pid[keep], value[keep]
+
+            # Group the values by (MID, PID), in message order
+            key = mids[idx].astype(np.int64) * 1024 + pid
+            order = np.lexsort((idx, key))
+            idx, key, value = idx[order], key[order], value[order]
+
+            keys, first = np.unique(key, return_index=True)
+            last = np.append(first[1:], len(key))
+            for k, i, j in zip(keys.tolist(), first.tolist(), last.tolist()):
+                columns[(k // 1024, k % 1024)] = (timestamps[idx[i:j]], value[i:j])
+
+        for key, items in other.items():
+            items = sorted(((i, v) for i, v in items if not bad[i]), key=lambda item: item[0])
+            if not items:
+                continue
+
+            # Assign the values one at a time so list values are not turned 
+            # into extra array dimensions
+            values = np.empty(len(items), dtype=object)
+            for n, (_, v) in enumerate(items):
+                values[n] = v
+            columns[key] = (timestamps[[i for i, _ in items]], values)
+
+        return columns
+
+
+def decode_batch(buf, offsets, timestamps=None, ignore_checksum=False):
+    """
+    Decode the messages in buf with a new BatchDecoder, see
+    BatchDecoder.decode().
+    """
+    return BatchDecoder(ignore_checksum=ignore_checksum).decode(buf, offsets, timestamps)
+
+
+__all__ = [
+    'pack_frames',
+    'BatchDecoder',
+    'decode_batch',
+]
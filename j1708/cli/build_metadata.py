@@ -0,0 +1,20 @@
+import argparse
+import sys
+
+from .. import metadata
+
+
+def main():
+    parser = argparse.ArgumentParser(description='compile the PID and SID metadata into a packed table')
+    parser.add_argument('output', nargs='?', default=metadata._PACKED_PATH,
+            help='output file (default: %(default)s)')
+    args = parser.parse_args()
+
+    data = metadata.compile_metadata()
+    with open(args.output, 'wb') as f:
+        f.write(data)
+    print(f'Wrote {len(data)} bytes to {args.output}', file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
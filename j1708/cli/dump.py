@@ -1,18 +1,22 @@
 import argparse
+import sys
 
 from .. import iface
 from .. import log
 from .. import rs485util
+from ..multisection import MultisectionReassembler
+from ..utils import OverflowPolicy, LRUCache
 
 
 def main():
     # TODO:
     #   1. Implement ability to Tx PID 195 to request info or clear DTCs
     #   2. change this from purely CLI to ipython interactive
-    #   3. Add timestamp support to j1708 firmware so logs have relative 
-    #      timestamps in them
     parser = argparse.ArgumentParser()
-    parser.add_argument('--port', '-p', help='manually specify J1708 device serial port')
+    parser.add_argument('--port', '-p', action='append',
+            help='manually specify J1708 device serial port, can be used multiple times to capture from several devices')
+    parser.add_argument('--all-devices', '-a', action='store_true',
+            help='capture from all connected J1708 devices')
     parser.add_argument('--no-decode', '-N', action='store_true',
             help='disable J1587 message decoding')
     parser.add_argument('--ignore-checksum', '-i', action='store_true',
@@ -23,22 +27,71 @@ def main():
             help='read J1708 messages from an existing log and re-parse them')
     parser.add_argument('--output-log', '-o',
             help='Save output to a log file')
+    parser.add_argument('--ring-size', '-b', type=int,
+            help='read from the device in a background thread, buffering up to RING_SIZE messages')
+    parser.add_argument('--overflow', choices=[p.value for p in OverflowPolicy],
+            default=OverflowPolicy.DROP_OLDEST.value,
+            help='what to do when the --ring-size buffer is full (default: %(default)s)')
+    parser.add_argument('--binary', action='store_true',
+            help='use the binary host protocol if the device firmware supports it')
+    parser.add_argument('--timestamps', '-t', action='store_true',
+            help='prefix each message with the time it was received, using device timestamps if the firmware supports them')
+    parser.add_argument('--cache-size', '-c', type=int, default=0,
+            help='cache up to CACHE_SIZE decoded messages so repeated messages are not decoded again (default: disabled)')
+    parser.add_argument('--multisection', '-m', action='store_true',
+            help='reassemble and log multisection parameters (PID 192) once all sections are received')
+    parser.add_argument('--multisection-timeout', type=float, default=5.0,
+            help='discard incomplete multisection parameters after MULTISECTION_TIMEOUT seconds without a new section (default: %(default)s)')
     args = parser.parse_args()
 
+    if args.cache_size < 0:
+        parser.error(f'invalid --cache-size {args.cache_size}')
+    cache = LRUCache(args.cache_size) if args.cache_size else None
+
+    if args.multisection and args.no_decode:
+        parser.error('--multisection cannot be used with --no-decode')
+    if args.multisection_timeout <= 0:
+        parser.error(f'invalid --multisection-timeout {args.multisection_timeout}')
+    if args.multisection:
+        multisection = MultisectionReassembler(timeout=args.multisection_timeout)
+    else:
+        multisection = None
+
     if args.reparse_log:
-        log.reparse(args.reparse_log, not args.no_decode, args.ignore_checksum, args.output_log)
+        log.reparse(args.reparse_log, not args.no_decode, args.ignore_checksum, args.output_log,
+                    timestamps=args.timestamps, cache=cache, multisection=multisection)
     elif args.import_from_raw:
         rs485util.parse_file(args.import_from_raw, not args.no_decode, args.ignore_checksum, args.output_log)
     else:
         if args.port:
-            port = args.port
+            ports = args.port
+        elif args.all_devices:
+            ports = iface.find_devices()
         else:
-            port = iface.find_device()
+            ports = [iface.find_device()]
 
-        assert port
-        dev = iface.Iface(port)
+        assert ports and all(ports)
+        if len(ports) > 1:
+            # Messages from all devices are merged into a single log
+            if args.ring_size:
+                parser.error('--ring-size cannot be used with multiple devices')
+            dev = iface.MultiIface(ports, binary=args.binary, device_timestamps=args.timestamps)
+        else:
+            dev = iface.Iface(ports[0], ring_size=args.ring_size, overflow=args.overflow, binary=args.binary,
+                              device_timestamps=args.timestamps)
         try:
-            dev.run(not args.no_decode, args.ignore_checksum, args.output_log)
+            dev.run(not args.no_decode, args.ignore_checksum, args.output_log, timestamps=args.timestamps,
+                    cache=cache, multisection=multisection)
         except KeyboardInterrupt:
             # Add a return char to help make the next command prompt look nice
             print('')
+
+    if cache is not None:
+        stats = cache.stats()
+        print(f'decode cache: {stats["hits"]} hits, {stats["misses"]} misses, {stats["evictions"]} evictions '
+              f'({stats["hit_rate"]:.1%} hit rate)', file=sys.stderr)
+
+    if multisection is not None:
+        stats = multisection.stats()
+        print(f'multisection: {stats["completed"]} completed, {stats["expired"]} expired, {stats["dropped"]} dropped, '
+              f'{stats["errors"]} errors, {stats["in_progress"]} incomplete', file=sys.stderr)
@@ -0,0 +1,55 @@
+import argparse
+import time
+
+from .. import emulator
+
+
+def main():
+    parser = argparse.ArgumentParser(
+            description='emulate a J1708 tool on a pty so j1708dump and other tools can be used without a device')
+    source = parser.add_mutually_exclusive_group()
+    source.add_argument('--replay', '-r',
+            help='replay J1708 messages from a j1708dump log or a file with one hex message per line')
+    source.add_argument('--synthetic', '-s', type=int, metavar='COUNT', nargs='?', const=-1,
+            help='send COUNT (default: unlimited) random messages')
+    rate = parser.add_mutually_exclusive_group()
+    rate.add_argument('--rate', type=float,
+            help='send a fixed number of messages per second')
+    rate.add_argument('--speedup', type=float, default=1.0,
+            help='send messages this many times faster than the real J1708 bus (default: %(default)s)')
+    rate.add_argument('--max-speed', action='store_true',
+            help='send messages as fast as possible')
+    parser.add_argument('--loop', '-l', action='store_true',
+            help='repeat the replayed messages until interrupted')
+    parser.add_argument('--seed', type=int,
+            help='random seed for synthetic messages')
+    parser.add_argument('--no-echo', action='store_true',
+            help='do not echo messages sent by the host back to it')
+    args = parser.parse_args()
+
+    emu = emulator.Emulator(echo=not args.no_echo)
+    print(f'Emulating J1708 tool on {emu.port}')
+
+    try:
+        emu.start()
+
+        speedup = None if args.max_speed else args.speedup
+        if args.replay:
+            msgs = emulator.read_corpus(args.replay)
+            emu.play(msgs, rate=args.rate, speedup=speedup, repeat=None if args.loop else 1)
+        elif args.synthetic is not None:
+            count = None if args.synthetic < 0 else args.synthetic
+            emu.play(emulator.synthetic_msgs(count, seed=args.seed), rate=args.rate, speedup=speedup)
+
+        if args.replay or args.synthetic is not None:
+            print(f'Sent {emu.played} messages')
+
+        # Keep running so the host can still transmit
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        # Add a return char to help make the next command prompt look nice
+        print('')
+    finally:
+        emu.stop()
+        emu.close()
@@ -0,0 +1,111 @@
+import collections
+
+
+class DeviceClock:
+    """
+    Maps timestamps from the J1708 tool (a free running 32-bit microsecond
+    counter) to host wall clock time.
+
+    Every message reaches the host some time after the tool timestamped it
+    (USB batching, OS scheduling, etc.).  That delay is never negative so the
+    smallest observed difference between the host receive time and the device
+    timestamp is the best estimate of the offset between the two clocks.  The
+    minimum offset is tracked for consecutive windows of device time and
+    a line fit through those minimums gives both the offset and the drift of
+    the device clock relative to the host clock.
+    """
+    def __init__(self, tick_rate=1000000, tick_bits=32, window=10.0, max_windows=30):
+        self.tick_rate = tick_rate
+        self.window = window
+
+        self._wrap = 1 << tick_bits
+        self._last_ticks = None
+        self._wraps = 0
+
+        # Device time (in seconds) of the first timestamp, used to keep the 
+        # numbers used in the line fit small.
+        self._origin = None
+
+        # (device time, minimum offset) for each completed window and the 
+        # window currently being filled.
+        self._windows = collections.deque(maxlen=max_windows)
+        self._cur = None
+        self._cur_start = None
+
+        # Current estimate: host time = device time + offset + drift * device time
+        self.offset = None
+        self.drift = 0.0
+
+    def unwrap(self, ticks):
+        """
+        Convert a device tick count to seconds, accounting for the counter
+        wrapping around.
+        """
+        if self._last_ticks is not None and ticks < self._last_ticks:
+            self._wraps += 1
+        self._last_ticks = ticks
+        return (self._wraps * self._wrap + ticks) / self.tick_rate
+
+    def update(self, ticks, host_time):
+        """
+        Add a device timestamp and the host time the message was received at to
+        the estimate, and return the device timestamp converted to host time.
+        """
+        device_time = self.unwrap(ticks)
+        if self._origin is None:
+            self._origin = device_time
+        device_time -= self._origin
+        offset = host_time - device_time
+
+        if self._cur is None:
+            self._cur_start = device_time
+            self._cur = (device_time, offset)
+        elif device_time - self._cur_start >= self.window:
+            self._windows.append(self._cur)
+            self._cur_start = device_time
+            self._cur = (device_time, offset)
+        elif offset < self._cur[1]:
+            self._cur = (device_time, offset)
+
+        self._estimate()
+        return device_time + self.offset + self.drift * device_time
+
+    def _estimate(self):
+        # The current window has not seen many messages yet so its minimum is 
+        # not very accurate, only use it until there are enough completed 
+        # windows.
+        points = list(self._windows)
+        if len(points) < 2:
+            points.append(self._cur)
+
+        if len(points) < 2:
+            self.offset = self._cur[1]
+            self.drift = 0.0
+            return
+
+        # Least squares line fit of the minimum offsets
+        count = len(points)
+        mean_x = sum(p[0] for p in points) / count
+        mean_y = sum(p[1] for p in points) / count
+        var_x = sum((p[0] - mean_x) ** 2 for p in points)
+        if var_x == 0:
+            self.offset = min(p[1] for p in points)
+            self.drift = 0.0
+            return
+
+        cov = sum((p[0] - mean_x) * (p[1] - mean_y) for p in points)
+        self.drift = cov / var_x
+        self.offset = mean_y - self.drift * mean_x
+
+    def to_host(self, ticks):
+        """
+        Convert a device timestamp to host time using the current estimate
+        without updating it.
+        """
+        device_time = self.unwrap(ticks) - self._origin
+        return device_time + self.offset + self.drift * device_time
+
+
+__all__ = [
+    'DeviceClock',
+]
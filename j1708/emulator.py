@@ -0,0 +1,340 @@
+import itertools
+import os
+import pty
+import random
+import select
+import threading
+import time
+import tty
+
+from .iface import Iface, HexFramer, BinaryFramer, HOST_CMD_BINARY, HOST_CMD_HEX, \
+        HOST_CMD_TIMESTAMPS, HOST_CMD_NO_TIMESTAMPS
+from .msg import J1708
+from .metadata import get_pid_info, get_pid_period
+from . import log
+
+
+# Sources used for synthetic traffic: engine, transmission, brakes, instrument 
+# cluster and vehicle management system
+SYNTHETIC_MIDS = (128, 130, 136, 140, 142)
+
+
+def synthetic_msgs(count=None, seed=None):
+    """
+    Generate random (but valid) J1708 messages, including checksums.  Each
+    message is from one of the SYNTHETIC_MIDS and contains 1 to 4 periodically
+    broadcast single or double character numeric PIDs.
+    """
+    rng = random.Random(seed)
+    pids = [p for p in range(192) if get_pid_period(p) is not None \
+            and isinstance(get_pid_info(p)['type'], str)]
+
+    for _ in itertools.repeat(None) if count is None else range(count):
+        body = bytearray((rng.choice(SYNTHETIC_MIDS),))
+        for pid in sorted(rng.sample(pids, rng.randint(1, 4))):
+            # PIDs 0-127 have 1 data character, 128-191 have 2
+            body.append(pid)
+            body += bytes(rng.getrandbits(8) for _ in range(1 if pid < 128 else 2))
+        body.append(J1708.calc_checksum(body))
+        yield bytes(body)
+
+
+def read_corpus(filename):
+    """
+    Read messages (including checksums) from a j1708dump log, or from a file
+    with one message in printable hex per line.
+    """
+    msgs = [m.msg for m in log.read_msgs(filename, decode=False)]
+    if msgs:
+        return msgs
+
+    with open(filename, 'r') as corpus:
+        return [bytes.fromhex(line) for line in corpus if line.strip()]
+
+
+class Emulator:
+    """
+    Pure-Python stand-in for the J1708 tool firmware.  A pty is opened and the
+    emulator acts as the tool on one side of it, the other side (the "port"
+    attribute) can be opened with Iface just like a real device:
+
+        with Emulator() as emu:
+            dev = Iface(emu.port, binary=True)
+            emu.inject(bytes.fromhex('8054005c00d0'))
+            print(dev.readmsg())
+
+    Messages sent by the host are saved in the "transmitted" list and, like
+    a real bus, echoed back to the host unless echo is False.  When the host
+    enables device timestamps injected messages are stamped with
+    a microsecond counter based on time.monotonic_ns() unless an explicit tick
+    value is provided.
+
+    Recorded or synthetic traffic can be replayed with play() (or in
+    a background thread with start_playback()) at a fixed message rate, or at
+    a multiple of the real J1708 bus speed.
+    """
+    # How often the emulator thread checks if it has been stopped
+    POLL_INTERVAL = 0.1
+
+    # The most messages written to the host at once when playback falls 
+    # behind schedule
+    MAX_BATCH = 64
+
+    def __init__(self, echo=True):
+        self._master, self._slave = pty.openpty()
+
+        # Raw mode so no characters are translated or echoed by the tty layer
+        tty.setraw(self._master)
+        tty.setraw(self._slave)
+        self.port = os.ttyname(self._slave)
+
+        self._framer = HexFramer()
+        self._timestamps = False
+        # Held while writing to the host or changing the host protocol mode
+        self._write_lock = threading.RLock()
+        self._thread = None
+        self._running = False
+
+        self.echo = echo
+        self.transmitted = []
+
+        self._playback = None
+        self._stop_playback = threading.Event()
+        self.played = 0
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.stop()
+
+    def __del__(self):
+        self.stop()
+        self.close()
+
+    def close(self):
+        for fd in (self._master, self._slave):
+            if fd is not None:
+                os.close(fd)
+        self._master = None
+        self._slave = None
+
+    @property
+    def binary(self):
+        return isinstance(self._framer, BinaryFramer)
+
+    @property
+    def timestamps(self):
+        return self._timestamps
+
+    @staticmethod
+    def ticks():
+        """
+        The current value of the emulated 32-bit microsecond timer
+        """
+        return (time.monotonic_ns() // 1000) & 0xFFFFFFFF
+
+    def start(self):
+        if self._thread is None:
+            self._running = True
+            self._thread = threading.Thread(target=self._run, daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self.stop_playback()
+        if self._thread is not None:
+            self._running = False
+            self._thread.join()
+            self._thread = None
+
+    def _write(self, data):
+        with self._write_lock:
+            view = memoryview(data)
+            while view:
+                written = os.write(self._master, view)
+                view = view[written:]
+
+    def inject(self, msg, ticks=None):
+        """
+        Send a message (including the checksum) to the host as if it had been
+        received from the J1708 bus.
+        """
+        with self._write_lock:
+            if not self._timestamps:
+                ticks = None
+            elif ticks is None:
+                ticks = self.ticks()
+            self._write(self._framer.encode_frame(msg, ticks=ticks))
+
+    def inject_many(self, msgs):
+        """
+        Send several messages to the host with a single write
+        """
+        with self._write_lock:
+            if self._timestamps:
+                ticks = self.ticks()
+            else:
+                ticks = None
+            self._write(b''.join(self._framer.encode_frame(m, ticks=ticks) for m in msgs))
+
+    def play(self, msgs, rate=None, speedup=1.0, repeat=1):
+        """
+        Send messages (including checksums) to the host as if they were
+        received from the bus.  Returns the number of messages sent.
+
+        If rate is specified messages are sent at that many messages per
+        second, otherwise each message takes as long as it would on a real
+        J1708 bus divided by speedup.  If speedup is None messages are sent as
+        fast as possible.  The messages are sent repeat times, or until
+        stop_playback() is called if repeat is None.
+        """
+        if repeat is None:
+            msgs = itertools.cycle(msgs)
+        elif repeat != 1:
+            msgs = itertools.chain.from_iterable(itertools.repeat(msgs, repeat))
+
+        sent = 0
+        batch = []
+        start = time.monotonic()
+        elapsed = 0.0
+        for msg in msgs:
+            if self._stop_playback.is_set():
+                break
+
+            # Messages are received by the tool when they are complete, so 
+            # each message is due after its bus time has passed.  Due times 
+            # are calculated from the start so the rate doesn't drift.
+            if rate is not None:
+                elapsed += 1 / rate
+            elif speedup is not None:
+                elapsed += Iface.bus_time(msg[:-1]) / speedup
+            wait = start + elapsed - time.monotonic()
+
+            if wait > 0:
+                if batch:
+                    self.inject_many(batch)
+                    sent += len(batch)
+                    batch = []
+                time.sleep(wait)
+
+            batch.append(msg)
+            if wait > 0 or len(batch) >= self.MAX_BATCH:
+                self.inject_many(batch)
+                sent += len(batch)
+                batch = []
+
+        if batch:
+            self.inject_many(batch)
+            sent += len(batch)
+
+        self.played += sent
+        return sent
+
+    def start_playback(self, msgs, rate=None, speedup=1.0, repeat=1):
+        """
+        Run play() in a background thread
+        """
+        self.stop_playback()
+        self._stop_playback.clear()
+        self._playback = threading.Thread(target=self.play, args=(msgs,), daemon=True,
+                kwargs={'rate': rate, 'speedup': speedup, 'repeat': repeat})
+        self._playback.start()
+
+    def wait_playback(self, timeout=None):
+        """
+        Wait for background playback to finish, returns True if it has
+        """
+        if self._playback is not None:
+            self._playback.join(timeout)
+            if self._playback.is_alive():
+                return False
+            self._playback = None
+        return True
+
+    def stop_playback(self):
+        if self._playback is not None:
+            self._stop_playback.set()
+            self._playback.join()
+            self._playback = None
+
+    def _frame_msgs(self, frames):
+        """
+        Convert frames to messages, this has to be done with the framer that
+        produced them because a later command may switch modes.
+        """
+        if self._framer.msg_format != 'hex':
+            return frames
+
+        msgs = []
+        for frame in frames:
+            try:
+                msgs.append(bytes.fromhex(frame.decode('latin-1')))
+            except ValueError:
+                continue
+        return msgs
+
+    def _feed(self, data):
+        """
+        Frame data received from the host and return the messages in it
+        """
+        msgs = self._frame_msgs(self._framer.feed(data))
+        while self._framer.control is not None:
+            control = self._framer.control
+            rest = self._framer.take()
+
+            # Like the firmware, acknowledge the command in the current mode 
+            # and then switch modes.  Unknown commands are ignored.  The lock 
+            # is held so no injected message is sent in the old mode after 
+            # the acknowledgement, and the mode is changed before the host 
+            # can see the acknowledgement.
+            with self._write_lock:
+                ack = self._framer.encode_control(control)
+                if control == HOST_CMD_BINARY:
+                    self._framer = BinaryFramer()
+                elif control == HOST_CMD_HEX:
+                    self._framer = HexFramer()
+                elif control in (HOST_CMD_TIMESTAMPS, HOST_CMD_NO_TIMESTAMPS):
+                    # Messages from the host never include timestamps, only 
+                    # the messages sent to the host change
+                    self._timestamps = control == HOST_CMD_TIMESTAMPS
+                else:
+                    ack = None
+
+                if ack is not None:
+                    self._write(ack)
+
+            msgs += self._frame_msgs(self._framer.feed(rest))
+        return msgs
+
+    def received(self, msg):
+        """
+        Called for each valid message the host sends.
+        """
+        self.transmitted.append(msg)
+        if self.echo:
+            self.inject(msg)
+
+    def _run(self):
+        while self._running:
+            ready, _, _ = select.select([self._master], [], [], self.POLL_INTERVAL)
+            if not ready:
+                continue
+
+            try:
+                data = os.read(self._master, 4096)
+            except OSError:
+                # The other side of the pty has been closed
+                continue
+
+            for msg in self._feed(data):
+                # The firmware ignores messages that are too short or too long
+                if 2 <= len(msg) <= 21:
+                    self.received(msg)
+
+
+__all__ = [
+    'synthetic_msgs',
+    'read_corpus',
+    'Emulator',
+]
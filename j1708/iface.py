@@ -1,9 +1,28 @@
+import collections
+import heapq
+import itertools
+import os
+import selectors
 import struct
+import threading
+import time
 import serial
 import serial.tools.list_ports
 
 from .msg import J1708
 from .log import Log
+from .exceptions import *
+from .utils import RingBuffer, OverflowPolicy
+from .clock import DeviceClock
+
+
+def find_devices():
+    """
+    Returns the ports of all USB devices that match the VID:PID and device
+    strings expected for the J1708 tool.
+    """
+    return [p.device for p in serial.tools.list_ports.grep('0483:5740')
+            if 'j1708 tool' in p.description.lower()]
 
 
 def find_device():
@@ -11,35 +30,351 @@ def find_device():
     Identifies if there are any USB devices that match the VID:PID and device
     strings expected for the J1708 tool.
     """
-    for p in serial.tools.list_ports.grep('0483:5740'): 
-        if 'j1708 tool' in p.description.lower():
-            return p.device
+    devices = find_devices()
+    if devices:
+        return devices[0]
     return None
 
 
-# TODO: Add an easy way to track multi-section "conversations"
+# The J1708 tool host protocol
+#
+# By default messages are exchanged as printable hex wrapped in start and end of 
+# message delimiters: "$<hex>*".  Commands are sent the same way but with 
+# a different start delimiter: "#<cmd>*".  The tool acknowledges a command by 
+# sending the same command back before acting on it.
+#
+# The "B" command switches the tool to binary mode.  In binary mode every frame 
+# is COBS encoded and terminated with a 0x00 byte.  A decoded frame is a length 
+# byte followed by that many bytes of J1708 message.  Frames with a length of 
+# 0 are commands, the command character follows the length byte.  The "H" 
+# command switches the tool back to hex mode.
+#
+# The "T" command enables device timestamps: every message from the tool is 
+# followed by the value of a free running 32-bit microsecond counter captured 
+# when the message started.  In hex mode the timestamp is the last 8 hex 
+# characters of the message (big-endian), in binary mode it is the last 
+# 4 bytes of the frame (little-endian, not included in the length byte).  The 
+# "t" command disables timestamps.
+#
+# The tool returns to hex mode without timestamps when the host opens the 
+# port, but the host still sets every mode when it connects (and restores the 
+# defaults when it disconnects) because earlier firmware kept the modes until 
+# it was reset.  Older firmware ignores commands, so if no acknowledgement is 
+# received the host stays in hex mode.
+HOST_CMD_BINARY = b'B'
+HOST_CMD_HEX = b'H'
+HOST_CMD_TIMESTAMPS = b'T'
+HOST_CMD_NO_TIMESTAMPS = b't'
+
+# J1708 bus timing, used to estimate how long the tool takes to transmit 
+# messages.  Each character is 10 bits (start + 8 data + stop) and a message 
+# can only be sent after the bus has been idle for 12 bit times + 2 bit times 
+# per priority level, assume the lowest priority (8).
+J1708_BAUD = 9600
+J1708_CHAR_BITS = 10
+J1708_IDLE_BITS = 12 + (2 * 8)
+
+
+def cobs_encode(data):
+    """
+    Consistent Overhead Byte Stuffing: encode data so it contains no 0x00
+    bytes.  The frame delimiter is not included.
+    """
+    out = bytearray()
+    for block in data.split(b'\x00'):
+        while len(block) >= 254:
+            out.append(0xFF)
+            out += block[:254]
+            block = block[254:]
+        out.append(len(block) + 1)
+        out += block
+    return bytes(out)
+
+
+def cobs_decode(data):
+    out = bytearray()
+    idx = 0
+    size = len(data)
+    while idx < size:
+        code = data[idx]
+        end = idx + code
+        if code == 0 or end > size:
+            raise J1708DecodeError(f'Invalid COBS frame {bytes(data).hex()}')
+        out += data[idx + 1:end]
+        idx = end
+        if code != 0xFF and idx < size:
+            out.append(0)
+    return bytes(out)
+
+
+class HexFramer:
+    """
+    Splits the stream of characters received from the J1708 tool into complete
+    host protocol messages (printable hex wrapped in start/end of message
+    delimiters).
+
+    If a command is received framing stops at the end of the command, the
+    command is saved in the "control" attribute and the unprocessed characters
+    are left in the buffer (see take()) because the command may change how the
+    rest of the stream has to be framed.
+    """
+    msg_format = 'hex'
+
+    def __init__(self, som=b'$', eom=b'*', cmd=b'#'):
+        self._som = som
+        self._eom = eom
+        self._cmd = cmd
+
+        # Characters that have been received but are not part of a complete
+        # message yet.  If a message is in progress (incoming is True) the
+        # buffer starts with the first character after the start of message
+        # delimiter.
+        self._buf = bytearray()
+        self.incoming = False
+        self.control = None
+
+        # Set when messages are followed by a device timestamp
+        self.timestamps = False
+
+    def reset(self):
+        self._buf.clear()
+        self.incoming = False
+        self.control = None
+
+    def take(self):
+        """
+        Return and clear any characters that have not been framed yet.
+        """
+        rest = bytes(self._buf)
+        self.reset()
+        return rest
+
+    def feed(self, data):
+        """
+        Add received characters to the framing buffer and return a list of all
+        messages that are now complete.  Any partial message is saved until the
+        next call.
+        """
+        buf = self._buf
+        buf += data
+
+        frames = []
+        start = 0
+        while True:
+            if not self.incoming:
+                som = buf.find(self._som, start)
+
+                # Check for a command before the next message
+                cmd = buf.find(self._cmd, start, len(buf) if som == -1 else som)
+                if cmd != -1:
+                    eom = buf.find(self._eom, cmd + 1)
+                    if eom == -1:
+                        del buf[:cmd]
+                    else:
+                        self.control = bytes(buf[cmd + 1:eom])
+                        del buf[:eom + 1]
+                    return frames
+
+                if som == -1:
+                    # Anything outside of a message is discarded
+                    buf.clear()
+                    return frames
+                start = som + 1
+                self.incoming = True
+
+            eom = buf.find(self._eom, start)
+            if eom == -1:
+                # Save the partial message for the next read
+                del buf[:start]
+                return frames
+
+            frames.append(bytes(buf[start:eom]))
+            start = eom + 1
+            self.incoming = False
+
+    def encode(self, msg):
+        # In theory the struck.pack method is the fastest way to convert an 
+        # integer to a single byte
+        return self.encode_frame(msg + struct.pack('>B', J1708.calc_checksum(msg)))
+
+    def encode_many(self, msgs):
+        """
+        Encode several messages (checksums are added) into one buffer
+        """
+        # join() calculates the total size first so the output is built in 
+        # a single allocation
+        parts = []
+        for msg in msgs:
+            parts += (self._som, msg.hex().encode(), b'%02x' % J1708.calc_checksum(msg), self._eom)
+        return b''.join(parts)
+
+    def encode_frame(self, msg_bytes, ticks=None):
+        """
+        Wrap a complete message (including the checksum) for the host protocol,
+        optionally followed by a device timestamp
+        """
+        # Convert the message into printable hex, then that string back to 
+        # bytes, then wrap that in the msg delimiters
+        if ticks is None:
+            return self._som + msg_bytes.hex().encode() + self._eom
+        return self._som + msg_bytes.hex().encode() + b'%08X' % ticks + self._eom
+
+    def encode_control(self, cmd):
+        return self._cmd + cmd + self._eom
+
+    def split_timestamp(self, frame):
+        """
+        Split a message received with device timestamps enabled into the
+        message and the device tick count.
+        """
+        try:
+            return frame[:-8], int(frame[-8:], 16)
+        except ValueError:
+            raise J1708DecodeError(f'Invalid timestamp in msg {frame}')
+
+
+class BinaryFramer:
+    """
+    Splits the stream of bytes received from the J1708 tool in binary mode into
+    complete J1708 messages.  Commands are handled the same way as HexFramer.
+    """
+    msg_format = 'bytes'
+
+    def __init__(self):
+        self._buf = bytearray()
+        self.control = None
+        self.timestamps = False
+
+        # Number of frames that were discarded because they could not be 
+        # decoded
+        self.errors = 0
+
+    def reset(self):
+        self._buf.clear()
+        self.control = None
+
+    def take(self):
+        rest = bytes(self._buf)
+        self.reset()
+        return rest
+
+    def feed(self, data):
+        buf = self._buf
+        buf += data
+
+        frames = []
+        start = 0
+        while True:
+            end = buf.find(0, start)
+            if end == -1:
+                # Save the partial frame for the next read
+                del buf[:start]
+                return frames
+
+            encoded = buf[start:end]
+            start = end + 1
+            if not encoded:
+                # Extra delimiters are allowed to resynchronize the stream
+                continue
+
+            try:
+                frame = cobs_decode(encoded)
+            except J1708DecodeError:
+                self.errors += 1
+                continue
+
+            if not frame:
+                self.errors += 1
+                continue
+            elif frame[0] == 0:
+                self.control = frame[1:]
+                del buf[:start]
+                return frames
+            elif frame[0] != len(frame) - (5 if self.timestamps else 1):
+                self.errors += 1
+                continue
+
+            frames.append(frame[1:])
+
+    def encode(self, msg):
+        return self.encode_frame(msg + struct.pack('>B', J1708.calc_checksum(msg)))
+
+    def encode_many(self, msgs):
+        parts = []
+        for msg in msgs:
+            parts += (cobs_encode(bytes((len(msg) + 1,)) + msg + bytes((J1708.calc_checksum(msg),))), b'\x00')
+        return b''.join(parts)
+
+    def encode_frame(self, msg_bytes, ticks=None):
+        frame = struct.pack('>B', len(msg_bytes)) + msg_bytes
+        if ticks is not None:
+            frame += struct.pack('<L', ticks)
+        return cobs_encode(frame) + b'\x00'
+
+    def encode_control(self, cmd):
+        return cobs_encode(b'\x00' + cmd) + b'\x00'
+
+    def split_timestamp(self, frame):
+        return frame[:-4], int.from_bytes(frame[-4:], 'little')
 
 
 class Iface:
-    def __init__(self, port=None, speed=115200, som=None, eom=None, timeout=None):
+    # How often the background reader thread checks if it has been stopped
+    READER_POLL_INTERVAL = 0.1
+
+    # How long to wait for the tool to acknowledge a mode change command
+    CMD_TIMEOUT = 0.5
+
+    # How many messages the tool can queue for transmit (the firmware 
+    # J1708_MSG_QUEUE_DEPTH, one slot is always empty).  When the queue is 
+    # full the oldest message is discarded.
+    TX_QUEUE_DEPTH = 63
+
+    def __init__(self, port=None, speed=115200, som=None, eom=None, timeout=None,
+                 ring_size=None, overflow=OverflowPolicy.DROP_OLDEST, binary=False,
+                 device_timestamps=False):
         self.port = port
         self.speed = speed
         self.timeout = timeout
 
-        if som is None:
-            self._som = b'$'
-        if eom is None:
-            self._eom = b'*'
+        self._som = b'$' if som is None else som
+        self._eom = b'*' if eom is None else eom
 
         # Used to track incoming messages.  If a timeout is specified then 
         # readmsg() may not be able to read a full message and any bytes 
-        # received need to be saved for the next read attempt.
-        self.msg = b''
-        self.incoming = False
+        # received need to be saved for the next read attempt.  A single read 
+        # may also contain more than one message, any extra complete messages 
+        # are queued until the next readmsg() call.  Each queued message is 
+        # a tuple of the message and the time it was received.
+        self._framer = HexFramer(som=self._som, eom=self._eom)
+        self._frames = collections.deque()
+
+        # Converts device timestamps to host time when they are enabled
+        self.clock = DeviceClock()
+
+        # If a ring size is specified a background thread reads messages from 
+        # the serial port into a ring buffer so no data is lost (or at least 
+        # the loss is counted) when the consumer can't keep up.
+        self._ring = None
+        self._reader = None
+
+        self._control = None
+
+        # When the messages written by send_many() should have been sent on 
+        # the bus (time.monotonic())
+        self._tx_done = 0.0
 
         self.serial = None
         self.open()
 
+        # The host protocol mode must be negotiated before the background 
+        # reader is started
+        if self.serial is not None:
+            self._negotiate(binary, device_timestamps)
+
+        if ring_size:
+            self.start_reader(ring_size, overflow)
+
     def __del__(self):
         self.close()
 
@@ -48,22 +383,255 @@ class Iface:
             self.serial = serial.Serial(port=self.port, baudrate=self.speed, timeout=self.timeout)
 
     def close(self):
+        self.stop_reader()
         if self.serial is not None:
+            # Put the tool back into the default mode for the next user
+            cmds = b''
+            if self.device_timestamps:
+                cmds += self._framer.encode_control(HOST_CMD_NO_TIMESTAMPS)
+            if self.binary:
+                cmds += self._framer.encode_control(HOST_CMD_HEX)
+            if cmds:
+                try:
+                    self.serial.write(cmds)
+                    self.serial.flush()
+                except serial.SerialException:
+                    # The device has been disconnected
+                    pass
             self.serial.close()
             self.serial = None
 
-    def send(self, msg):
-        # In theory the struck.pack method is the fastest way to convert an 
-        # integer to a single byte
-        msg_bytes = msg + struct.pack('>B', J1708.calc_checksum(msg))
+    def start_reader(self, ring_size=4096, overflow=OverflowPolicy.DROP_OLDEST):
+        """
+        Start a background thread that drains the serial port into a ring
+        buffer of at most ring_size messages.  The overflow policy determines
+        what happens when the buffer is full (see OverflowPolicy).
+        """
+        if self._reader is not None:
+            return
 
-        # Convert the message into printable hex, then that string back to 
-        # bytes, then wrap that in the msg delimiters and send it
-        data = self._som + msg_bytes.hex().encode() + self._eom
+        self._ring = RingBuffer(ring_size, overflow)
 
+        # The reader thread needs the serial port reads to time out 
+        # periodically so it can notice when it has been stopped
+        self.serial.timeout = self.READER_POLL_INTERVAL
+
+        self._reader = threading.Thread(target=self._read_thread, daemon=True)
+        self._reader.start()
+
+    def stop_reader(self):
+        if self._reader is not None:
+            self._ring.close()
+            self._reader.join()
+            self._reader = None
+            if self.serial is not None:
+                self.serial.timeout = self.timeout
+
+    def _read_thread(self):
+        ring = self._ring
+        while not ring.closed:
+            try:
+                data = self._read_chunk()
+            except serial.SerialException:
+                # The device has been disconnected
+                ring.close()
+                break
+
+            for frame in self._feed(data):
+                ring.put(frame)
+
+    @property
+    def binary(self):
+        return isinstance(self._framer, BinaryFramer)
+
+    @property
+    def msg_format(self):
+        """
+        The format of the messages returned by readmsg(): 'hex' or 'bytes'
+        """
+        return self._framer.msg_format
+
+    @property
+    def device_timestamps(self):
+        return self._framer.timestamps
+
+    def _feed(self, data):
+        """
+        Frame received data and return a list of (msg, timestamp) tuples
+        """
+        now = time.time()
+        msgs = self._stamp(self._framer.feed(data), now)
+        while self._framer.control is not None:
+            control = self._framer.control
+            rest = self._framer.take()
+
+            # The tool acknowledges a mode change before switching, so any 
+            # characters after the acknowledgement are in the new mode.
+            timestamps = self._framer.timestamps
+            if control == HOST_CMD_BINARY:
+                self._framer = BinaryFramer()
+            elif control == HOST_CMD_HEX:
+                self._framer = HexFramer(som=self._som, eom=self._eom)
+            elif control == HOST_CMD_TIMESTAMPS:
+                timestamps = True
+            elif control == HOST_CMD_NO_TIMESTAMPS:
+                timestamps = False
+            self._framer.timestamps = timestamps
+            self._control = control
+
+            msgs += self._stamp(self._framer.feed(rest), now)
+        return msgs
+
+    def _stamp(self, frames, now):
+        if not self._framer.timestamps:
+            return [(frame, now) for frame in frames]
+
+        msgs = []
+        for frame in frames:
+            try:
+                msg, ticks = self._framer.split_timestamp(frame)
+            except J1708DecodeError:
+                # Leave the invalid message as-is, it won't pass the checksum
+                msgs.append((frame, now))
+            else:
+                msgs.append((msg, self.clock.update(ticks, now)))
+        return msgs
+
+    def _negotiate(self, binary, device_timestamps):
+        """
+        Set every host protocol mode explicitly, the tool may have been left in
+        a non-default mode by the previous program that used it.
+        """
+        # A tool in hex mode ignores anything outside of a "$...*" or "#...*" 
+        # message so it is safe to send a binary mode command first in case 
+        # the tool was left in binary mode.
+        self.serial.write(BinaryFramer().encode_control(HOST_CMD_HEX))
+
+        # Older firmware doesn't acknowledge commands and only supports the 
+        # default modes
+        if self._command(HOST_CMD_HEX):
+            self._command(HOST_CMD_TIMESTAMPS if device_timestamps else HOST_CMD_NO_TIMESTAMPS)
+            if binary:
+                self._command(HOST_CMD_BINARY)
+
+        # Messages received before the mode was known may not have been 
+        # framed correctly
+        self._frames.clear()
+
+    def set_binary(self, enable=True):
+        """
+        Ask the tool to switch to (or from) the binary host protocol.  Returns
+        True if the tool is now in the requested mode, tools that don't support
+        binary mode don't respond and will stay in hex mode.
+        """
+        if enable == self.binary:
+            return True
+        return self._command(HOST_CMD_BINARY if enable else HOST_CMD_HEX)
+
+    def set_device_timestamps(self, enable=True):
+        """
+        Ask the tool to include (or stop including) a timestamp with every
+        message.  Returns True if the tool is now in the requested mode.
+        Message times are converted from device time to host time by the
+        DeviceClock in the "clock" attribute.
+        """
+        if enable == self.device_timestamps:
+            return True
+        return self._command(HOST_CMD_TIMESTAMPS if enable else HOST_CMD_NO_TIMESTAMPS)
+
+    def _command(self, cmd):
+        if self._reader is not None:
+            raise J1708Error('Cannot change the host protocol mode while the background reader is running')
+
+        self._control = None
+        self.serial.write(self._framer.encode_control(cmd))
+        self.serial.flush()
+
+        # Wait for the acknowledgement, any messages received in the meantime 
+        # are saved
+        self.serial.timeout = self.CMD_TIMEOUT
+        try:
+            while self._control != cmd:
+                data = self._read_chunk()
+                if not data:
+                    break
+                self._frames.extend(self._feed(data))
+        finally:
+            self.serial.timeout = self.timeout
+
+        return self._control == cmd
+
+    @property
+    def stats(self):
+        """
+        Returns the receive counters of the background reader, or None if the
+        reader thread is not being used.
+        """
+        if self._ring is None:
+            return None
+        return self._ring.stats()
+
+    def send(self, msg):
+        data = self._framer.encode(msg)
         self.serial.write(data)
         self.serial.flush()
 
+    @staticmethod
+    def bus_time(msg):
+        """
+        Estimate how long it takes to transmit a message (without the
+        checksum) on the J1708 bus
+        """
+        return ((len(msg) + 1) * J1708_CHAR_BITS + J1708_IDLE_BITS) / J1708_BAUD
+
+    def send_many(self, msgs, pace=True, batch_size=None):
+        """
+        Send several messages (checksums are added).  Returns the number of
+        messages sent.
+
+        If pace is False all of the messages are encoded into one buffer and
+        sent with a single write and flush, the tool discards the oldest
+        queued messages if more than TX_QUEUE_DEPTH are waiting.
+
+        If pace is True (the default) the messages are written in chunks of at
+        most batch_size messages (default TX_QUEUE_DEPTH), one write and flush
+        per chunk.  Before each chunk is written this method sleeps until the
+        previously written messages, including those from earlier
+        send_many() calls, should have been transmitted on the bus so the
+        tool's transmit queue does not overflow.  The calling thread is
+        blocked for about the bus time of everything written before the last
+        chunk (roughly 1 ms per message character at 9600 baud), so a caller
+        that has to stay responsive, such as the BroadcastScheduler thread,
+        is delayed by long batches.
+        """
+        if not pace:
+            msgs = list(msgs)
+            self.serial.write(self._framer.encode_many(msgs))
+            self.serial.flush()
+            return len(msgs)
+
+        if batch_size is None:
+            batch_size = self.TX_QUEUE_DEPTH
+
+        sent = 0
+        msgs = iter(msgs)
+        while True:
+            batch = list(itertools.islice(msgs, batch_size))
+            if not batch:
+                break
+
+            wait = self._tx_done - time.monotonic()
+            if wait > 0:
+                time.sleep(wait)
+
+            self.serial.write(self._framer.encode_many(batch))
+            self.serial.flush()
+            sent += len(batch)
+
+            self._tx_done = time.monotonic() + sum(self.bus_time(m) for m in batch)
+
+        return sent
+
     def read(self):
         """
         nonblocking read pending characters
@@ -71,38 +639,59 @@ class Iface:
         read_bytes = self.serial.in_waiting
         return self.serial.read(read_bytes)
 
+    def _read_chunk(self):
+        """
+        Read all pending characters, if no characters are pending block (until
+        the port timeout) for at least one.
+        """
+        data = self.serial.read(self.serial.in_waiting or 1)
+        if data:
+            # Pick up anything else that arrived while the read was blocked
+            pending = self.serial.in_waiting
+            if pending:
+                data += self.serial.read(pending)
+        return data
+
     def readmsg(self, timeout=None):
         """
         blocking read and return an entire message
         """
+        msg = self.readmsg_timed(timeout=timeout)
+        if msg is None:
+            return None
+        return msg[0]
+
+    def readmsg_timed(self, timeout=None):
+        """
+        blocking read and return an entire message and the time it was
+        received as a (msg, timestamp) tuple.  If device timestamps are
+        enabled the timestamp is the device time converted to host time.
+        """
+        if self._ring is not None:
+            if timeout is None:
+                timeout = self.timeout
+            return self._ring.get(timeout=timeout)
+
+        if self._frames:
+            return self._frames.popleft()
+
         # If a timeout is specified, override the initialization value for this 
         # port
         if timeout is not None:
             self.serial.timeout = timeout
 
-        while True:
-            char = self.serial.read()
-
-            if char is None:
-                # Timeout occurred
-                if timeout is not None:
-                    self.serial.timeout = self.timeout
-                return None
-
-            if not self.incoming and char == self._som:
-                self.incoming = True
-            elif self.incoming and char != self._eom:
-                self.msg += char
-            elif self.incoming and char == self._eom:
-                msg = self.msg
-
-                # Clear the in-progress message values before returning
-                self.msg = b''
-                self.incoming = False
+        try:
+            while not self._frames:
+                data = self._read_chunk()
+                if not data:
+                    # Timeout occurred
+                    return None
+                self._frames.extend(self._feed(data))
+        finally:
+            if timeout is not None:
+                self.serial.timeout = self.timeout
 
-                if timeout is not None:
-                    self.serial.timeout = self.timeout
-                return msg
+        return self._frames.popleft()
 
     def __iter__(self):
         """
@@ -115,23 +704,357 @@ class Iface:
         Blocks until a message is received.  Never stops.  If a timeout occurs
         will return None.
         """
-        return self.readmsg(timeout=timeout)
+        msg = self._next_timed(timeout=timeout)
+        if msg is None:
+            return None
+        return msg[0]
+
+    def _next_timed(self, timeout=None):
+        msg = self.readmsg_timed(timeout=timeout)
+        if msg is None and self._ring is not None and self._ring.closed and not len(self._ring):
+            # The background reader has stopped and everything it received 
+            # has been returned
+            raise StopIteration
+        return msg
 
-    def run(self, decode=True, ignore_checksum=False, log_filename=None):
+    def run(self, decode=True, ignore_checksum=False, log_filename=None, timestamps=False, cache=None,
+            multisection=None):
         """
         Dump and decode J1708 messages until interrupted.
         """
-        log = Log(decode=decode, ignore_checksum=ignore_checksum, log_filename=log_filename)
+        log = Log(decode=decode, ignore_checksum=ignore_checksum, log_filename=log_filename,
+                  msg_format=self.msg_format, timestamps=timestamps, cache=cache, multisection=multisection)
         try:
-            for msg in self:
+            while True:
+                msg = self._next_timed()
                 if msg is not None:
-                    log.logmsg(msg)
+                    log.logmsg(msg[0], timestamp=msg[1])
+        except (KeyboardInterrupt, StopIteration):
+            # Add a return char to help make the next command prompt look nice
+            print('')
+
+
+class MultiIface:
+    """
+    Reads from several J1708 tools at once (from a single thread) and merges
+    the messages into one stream ordered by the time they were received:
+
+        with MultiIface(find_devices()) as devs:
+            for port, msg, timestamp in devs:
+                ...
+
+    Messages are held for reorder_window seconds so that messages from
+    different devices can be put in order, messages that arrive later than
+    that are passed on immediately (and counted in the "late" attribute).  At
+    most max_pending messages are held, when there are more the oldest
+    message is passed on.  Any other keyword arguments are passed to Iface.
+    """
+    def __init__(self, ports, reorder_window=0.05, max_pending=1024, **kwargs):
+        if not ports:
+            raise J1708Error('No ports specified')
+
+        self.reorder_window = reorder_window
+        self.max_pending = max_pending
+
+        self._selector = selectors.DefaultSelector()
+        self._pending = []
+        self._seq = itertools.count()
+        self._last = None
+        self.late = 0
+
+        self.ifaces = {}
+        try:
+            for port in ports:
+                self.ifaces[port] = Iface(port, **kwargs)
+        except:
+            self.close()
+            raise
+
+        for port, iface in self.ifaces.items():
+            self._selector.register(iface.serial.fileno(), selectors.EVENT_READ, port)
+
+            # Messages may have been received while negotiating the host 
+            # protocol mode
+            while iface._frames:
+                self._push(port, *iface._frames.popleft())
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def __del__(self):
+        self.close()
+
+    def close(self):
+        for port, iface in self.ifaces.items():
+            if iface.serial is not None:
+                self._remove(port)
+        self._selector.close()
+
+    def _remove(self, port):
+        iface = self.ifaces[port]
+        try:
+            self._selector.unregister(iface.serial.fileno())
+        except (KeyError, ValueError):
+            pass
+        iface.close()
+
+    @property
+    def ports(self):
+        """
+        The ports that are still open
+        """
+        return [p for p, i in self.ifaces.items() if i.serial is not None]
+
+    def _push(self, port, msg, timestamp):
+        heapq.heappush(self._pending, (timestamp, next(self._seq), port, msg))
+
+    def _pop(self):
+        timestamp, _, port, msg = heapq.heappop(self._pending)
+        if self._last is not None and timestamp < self._last:
+            self.late += 1
+        else:
+            self._last = timestamp
+        return (port, msg, timestamp)
+
+    def _read_ready(self, timeout):
+        for key, _ in self._selector.select(timeout):
+            port = key.data
+            try:
+                data = self.ifaces[port].read()
+            except (serial.SerialException, OSError):
+                data = b''
+            if not data:
+                # The device has been disconnected
+                self._remove(port)
+                continue
+
+            for msg, timestamp in self.ifaces[port]._feed(data):
+                self._push(port, msg, timestamp)
+
+    def readmsg(self, timeout=None):
+        """
+        Returns the next (port, msg, timestamp) tuple, or None if a timeout
+        occurs or all devices have been disconnected and there are no more
+        messages.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            if self._pending:
+                if len(self._pending) > self.max_pending:
+                    return self._pop()
+
+                # Wait until the oldest message has been held long enough
+                wait = self._pending[0][0] + self.reorder_window - time.time()
+                if wait <= 0 or not self.ports:
+                    return self._pop()
+            elif not self.ports:
+                return None
+            else:
+                wait = None
+
+            if deadline is not None:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return None
+                wait = remaining if wait is None else min(wait, remaining)
+
+            self._read_ready(wait)
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        msg = self.readmsg()
+        if msg is None:
+            raise StopIteration
+        return msg
+
+    def run(self, decode=True, ignore_checksum=False, log_filename=None, timestamps=False, cache=None,
+            multisection=None):
+        """
+        Dump and decode J1708 messages from all devices until interrupted.
+        """
+        log = Log(decode=decode, ignore_checksum=ignore_checksum, log_filename=log_filename,
+                  timestamps=timestamps, multisection=multisection)
+
+        # Devices may not all be using the same host protocol mode
+        formats = {p: i.msg_format for p, i in self.ifaces.items()}
+        try:
+            for port, msg, timestamp in self:
+                j1708_msg = J1708.from_frame(msg, msg_format=formats[port], timestamp=timestamp, decode=decode,
+                                             ignore_checksum=ignore_checksum, cache=cache)
+                log.logmsg(j1708_msg, source=port)
         except KeyboardInterrupt:
             # Add a return char to help make the next command prompt look nice
             print('')
 
 
+class AsyncIface:
+    """
+    asyncio version of Iface.  The serial port is registered with the running
+    event loop (loop.add_reader()) so received characters are framed as they
+    arrive and nothing blocks the loop.  Iterating over this object returns
+    J1708 messages:
+
+        async with AsyncIface(port) as iface:
+            await iface.send(bytes.fromhex('256064'))
+            async for msg in iface:
+                print(msg.format_for_log())
+
+    Because the event loop has to be able to select() on the port this only
+    works on platforms where serial ports are file descriptors (not Windows).
+    """
+    def __init__(self, port=None, speed=115200, som=None, eom=None, decode=True, ignore_checksum=False, lazy=False, cache=None):
+        # asyncio is slow to import and only needed by this class
+        import asyncio
+
+        self.port = port
+        self.speed = speed
+        self.decode = decode
+        self.ignore_checksum = ignore_checksum
+
+        # If lazy is set the PIDs of each message are only decoded when they 
+        # are accessed, which is faster when most messages are filtered out
+        self.lazy = lazy
+
+        # Optional LRU cache of decoded messages (see J1708)
+        self.cache = cache
+
+        self._som = b'$' if som is None else som
+        self._eom = b'*' if eom is None else eom
+        self._framer = HexFramer(som=self._som, eom=self._eom)
+
+        # Complete messages are queued by the reader callback until they are 
+        # retrieved by readmsg().  A None in the queue indicates the port has 
+        # been closed.
+        self._frames = asyncio.Queue()
+        self._error = None
+        self._send_lock = asyncio.Lock()
+
+        # Number of received messages that were discarded because of an 
+        # invalid checksum
+        self.checksum_errors = 0
+
+        self.serial = None
+        self._loop = None
+
+    async def __aenter__(self):
+        await self.open()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        self.close()
+
+    async def open(self):
+        if self.port is not None and self.serial is None:
+            # A timeout of 0 makes reads non-blocking, the reader callback only 
+            # runs when there are characters waiting.
+            self.serial = serial.Serial(port=self.port, baudrate=self.speed, timeout=0)
+
+            # Only the default host protocol mode is supported, put the tool 
+            # back into it in case the previous program that used it didn't 
+            # (see Iface._negotiate()).  The acknowledgements are ignored.
+            self.serial.write(BinaryFramer().encode_control(HOST_CMD_HEX) +
+                              self._framer.encode_control(HOST_CMD_HEX) +
+                              self._framer.encode_control(HOST_CMD_NO_TIMESTAMPS))
+
+            import asyncio
+            self._loop = asyncio.get_running_loop()
+            self._loop.add_reader(self.serial.fileno(), self._read_ready)
+
+    def close(self):
+        if self.serial is not None:
+            self._loop.remove_reader(self.serial.fileno())
+            self.serial.close()
+            self.serial = None
+
+            # Wake up anything waiting for a message
+            self._frames.put_nowait(None)
+
+    def _read_ready(self):
+        try:
+            data = self.serial.read(self.serial.in_waiting or 1)
+        except serial.SerialException as e:
+            # The device has most likely been disconnected, save the error so 
+            # it can be raised to the reader
+            self._error = e
+            self.close()
+            return
+
+        frames = self._framer.feed(data)
+        while self._framer.control is not None:
+            # Command acknowledgements are not used, keep framing the rest of 
+            # the data
+            frames += self._framer.feed(self._framer.take())
+
+        for frame in frames:
+            self._frames.put_nowait(frame)
+
+    async def _writable(self):
+        fd = self.serial.fileno()
+        ready = self._loop.create_future()
+        self._loop.add_writer(fd, ready.set_result, None)
+        try:
+            await ready
+        finally:
+            self._loop.remove_writer(fd)
+
+    async def send(self, msg):
+        data = memoryview(self._framer.encode(msg))
+
+        # Only one message may be written at a time, otherwise partial writes 
+        # of different messages could be interleaved
+        async with self._send_lock:
+            while data:
+                try:
+                    written = os.write(self.serial.fileno(), data)
+                except BlockingIOError:
+                    written = 0
+                data = data[written:]
+                if data:
+                    await self._writable()
+
+    async def readmsg(self):
+        """
+        Wait for and return the next raw message.  Returns None once the port
+        has been closed.
+        """
+        frame = await self._frames.get()
+        if frame is None:
+            # Leave the marker in the queue for any other readers
+            self._frames.put_nowait(None)
+            if self._error is not None:
+                raise self._error
+        return frame
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        while True:
+            frame = await self.readmsg()
+            if frame is None:
+                raise StopAsyncIteration
+
+            try:
+                return J1708.from_frame(frame, msg_format=self._framer.msg_format, decode=self.decode,
+                                        ignore_checksum=self.ignore_checksum, lazy=self.lazy,
+                                        cache=self.cache)
+            except J1708ChecksumError:
+                self.checksum_errors += 1
+
+
 __all__ = [
+    'find_devices',
     'find_device',
+    'cobs_encode',
+    'cobs_decode',
+    'HexFramer',
+    'BinaryFramer',
     'Iface',
+    'MultiIface',
+    'AsyncIface',
 ]
@@ -131,15 +131,7 @@ class J1708Interface(object):
         Calculate the J1708 checksum for mid and data. mid is an integer and
         data is a byte array
         '''
-        chksum = 0
-        chksum = mid & 0xFF
-        for char in data:
-            chksum = (chksum + char) & 0xFF
- 
-        if chksum != 0:
-            # Determine what the checksum _should_ be
-            chksum = 0x100 - chksum
-        return chksum
+        return -(mid + sum(data)) & 0xFF
         
     def txFromFile(self, filename, timing=0.5, mid=None):
         '''
@@ -54,12 +54,26 @@ class ReplayMsgList:
 
 
 class Log:
-    def __init__(self, decode=True, explicit_flags=False, ignore_checksum=False, log_filename=None, stdout=True):
+    def __init__(self, decode=True, explicit_flags=False, ignore_checksum=False, log_filename=None, stdout=True, msg_format=None, timestamps=False, cache=None, multisection=None):
         # Save the format/decode settings
         self._decode = decode
+
+        # Optional LRU cache of decoded messages (see J1708)
+        self._cache = cache
+
+        # Optional MultisectionReassembler, each multisection parameter that 
+        # is completed is logged after the section that completed it
+        self._multisection = multisection
         self._explicit_flags = explicit_flags
         self._ignore_checksum = ignore_checksum
 
+        # The format of raw messages passed to logmsg() ('hex' or 'bytes'), if 
+        # not specified each message is checked
+        self._msg_format = msg_format
+
+        # Prefix each message with the time it was received
+        self._timestamps = timestamps
+
         # Open the output files
         self._filename = log_filename
         self._fds = []
@@ -88,60 +102,73 @@ class Log:
         for fd in self._fds:
             fd.write(msg)
 
-    def logmsg(self, msg):
+    def logmsg(self, msg, timestamp=None, source=None):
         if isinstance(msg, str):
             # If this is a string, log it
             self.write(msg)
         else:
             if isinstance(msg, bytes):
                 # decode this as a J1708 message
-                j1708_msg = J1708(msg, decode=self._decode, ignore_checksum=self._ignore_checksum)
+                j1708_msg = J1708.from_frame(msg, msg_format=self._msg_format, timestamp=timestamp,
+                                             decode=self._decode, ignore_checksum=self._ignore_checksum,
+                                             cache=self._cache)
             else:
                 # Assume it already is a J1708 message
                 j1708_msg = msg
 
+            if self._timestamps and j1708_msg is not None:
+                prefix = f'[{j1708_msg.time:.6f}] '
+            else:
+                prefix = ''
+
+            # When logging from multiple devices identify the source port
+            if source is not None:
+                prefix += f'{source}: '
+
             if j1708_msg is not None and j1708_msg.is_valid():
                 if self._decode:
                     logmsg = j1708_msg.format_for_log(explicit_flags=self._explicit_flags)
-                    self.write(logmsg)
+                    self.write(prefix + logmsg)
+
+                    if self._multisection is not None:
+                        for merged in self._multisection.feed(j1708_msg, source=source):
+                            self.logmsg(merged, source=source)
                 else:
-                    self.write(j1708_msg)
+                    self.write(f'{prefix}{j1708_msg}')
             else:
-                self.write(f'INVALID CHECKSUM: {j1708_msg}')
+                self.write(f'{prefix}INVALID CHECKSUM: {j1708_msg}')
 
 
-def read_msgs(filename, realtime=False):
+def read_msgs(filename, realtime=False, cache=None, decode=True):
     msgs = []
-    msg_pat = re.compile(r'^[^ ].*\([0-9]+\): ([0-9A-Fa-f]+) \(([0-9A-Fa-f]+)\)')
+    msg_pat = re.compile(r'^(?:\[([0-9]+\.[0-9]+)\] )?[^ ].*\([0-9]+\): ([0-9A-Fa-f]+) \(([0-9A-Fa-f]+)\)')
     with open(filename, 'r') as logfile:
         for line in logfile:
             match = msg_pat.match(line)
             if match:
-                msgbody, msgchksum = match.groups()
+                msgtime, msgbody, msgchksum = match.groups()
+
+                # Logs written with timestamps enabled start each message with 
+                # the time it was received
+                if msgtime is not None:
+                    msgtime = float(msgtime)
 
                 # The older log style did not include the checksum byte in the 
                 # raw message body, but the newer log style does, if the 
-                # checksum value matches the last byte of the message assume 
-                # this is the newer style.  If a checksum error occurs turning 
-                # this into a J1708 message the older style format will be used
+                # message body has a valid checksum assume this is the newer 
+                # style, otherwise the older style format is used.  The 
+                # checksum is only checked here, not again when the J1708 
+                # message is created.
                 msg_bytes = bytes.fromhex(msgbody)
-
-                try:
-                    j1708_msg = J1708(msg_bytes)
-                except J1708ChecksumError:
+                if len(msg_bytes) < 2 or sum(msg_bytes) & 0xFF != 0:
                     # Attempt to use the older log style
-                    if len(msgchksum) < 2:
-                        msg = msgbody + '0' + msgchksum
-                    else:
-                        msg = msgbody + msgchksum
-                    msg_bytes = bytes.fromhex(msg)
-
-                    try:
-                        j1708_msg = J1708(msg_bytes)
-                    except J1708ChecksumError:
+                    msg_bytes += bytes.fromhex(msgchksum.rjust(2, '0'))
+                    if sum(msg_bytes) & 0xFF != 0:
                         errmsg = f'Unable to decode valid msg from log line "{line}"'
                         raise J1708LogParseError(errmsg)
 
+                j1708_msg = J1708.from_validated(msg_bytes, msgtime, msg_bytes[-1], decode=decode, cache=cache)
+
                 #yield j1708_msg
                 msgs.append(j1708_msg)
 
@@ -152,9 +179,11 @@ def read_msgs(filename, realtime=False):
     return ReplayMsgList(msgs, realtime=realtime)
 
 
-def reparse(filename, decode=True, ignore_checksum=False, log_filename=None):
-    log = Log(decode=decode, ignore_checksum=ignore_checksum, log_filename=log_filename)
-    for msg in read_msgs(filename):
+def reparse(filename, decode=True, ignore_checksum=False, log_filename=None, timestamps=False, cache=None,
+            multisection=None):
+    log = Log(decode=decode, ignore_checksum=ignore_checksum, log_filename=log_filename,
+              timestamps=timestamps, multisection=multisection)
+    for msg in read_msgs(filename, cache=cache, decode=decode):
         log.logmsg(msg)
 
 
@@ -0,0 +1,395 @@
+"""
+PID, PID name and SID metadata lookups.
+
+The metadata is defined in pid_info, pid_name and sid_consts as Python dicts,
+which are slow to import and use a lot of memory in every process that decodes
+messages.  The same information can be compiled into a packed binary table:
+
+    python -m j1708.cli.build_metadata
+
+which writes metadata.bin next to this module (or "make metadata").  When
+metadata.bin exists and matches the source modules it is mapped into memory
+and looked up directly, so processes running side by side share one copy of
+it.  Otherwise the source modules are imported and used instead.
+
+Table format (all integers are little endian):
+
+    header          magic, format version, SHA-1 of the source modules and
+                    the offsets of the other sections
+    string offsets  (num strings + 1) uint32 offsets into the string pool
+    string pool     UTF-8 strings
+    PID info        one record per PID (0-1023), see _PID_RECORD
+    PID names       one uint16 string index per PID (0-1023)
+    SID MIDs        one uint16 SID table index per MID (0-255)
+    SID tables      _NUM_SIDS uint16 string indexes per SID table, table 0
+                    is used for MIDs that don't have their own table
+
+String indexes of _NO_STRING mean the value is not present.
+"""
+
+import hashlib
+import mmap
+import os
+import re
+import struct
+from fractions import Fraction
+
+from . import mids
+
+
+_MAGIC = b'J1708MD\x00'
+_VERSION = 1
+
+_SOURCES = ('pid_info.py', 'pid_name.py', 'sid_consts.py')
+
+_PACKED_PATH = os.path.join(os.path.dirname(__file__), 'metadata.bin')
+
+_NUM_PIDS = 1024
+_NUM_MIDS = 256
+_NUM_SIDS = 512
+_NO_STRING = 0xFFFF
+
+# magic, version, source digest, number of strings, number of SID tables, 
+# string offsets, string pool, PID info, PID names, SID MIDs, SID tables
+_HEADER = struct.Struct('<8sH2x20sII6I')
+
+# flags, string index for each of _PID_STRING_FIELDS, resolution numerator 
+# and denominator
+_PID_STRING_FIELDS = ('length', 'name', 'period', 'priority', 'range', 'resolution', 'type', 'units')
+_PID_RECORD = struct.Struct(f'<H{len(_PID_STRING_FIELDS)}Hii')
+
+_PID_PRESENT = 0x0001           # the PID has an info record
+_PID_FRACTION = 0x0002          # the resolution is a Fraction
+_PID_TYPE_CLASS = 0x0004        # the type string is the name of a pid_types class
+
+_UINT16 = struct.Struct('<H')
+_UINT32 = struct.Struct('<I')
+
+
+def _source_digest():
+    digest = hashlib.sha1()
+    directory = os.path.dirname(__file__)
+    for name in _SOURCES:
+        with open(os.path.join(directory, name), 'rb') as f:
+            digest.update(f.read())
+    return digest.digest()
+
+
+class _StringPool:
+    def __init__(self):
+        self.strings = []
+        self._index = {}
+
+    def add(self, string):
+        if string is None:
+            return _NO_STRING
+        try:
+            return self._index[string]
+        except KeyError:
+            pass
+
+        index = len(self.strings)
+        if index >= _NO_STRING:
+            raise ValueError(f'Too many metadata strings ({index})')
+        self.strings.append(string)
+        self._index[string] = index
+        return index
+
+
+def _pack_pid_info(info, pool):
+    from . import pid_types
+
+    unknown = set(info) - set(_PID_STRING_FIELDS) - {'pid'}
+    if unknown:
+        raise ValueError(f'Unsupported PID info fields {sorted(unknown)} for PID {info["pid"]}')
+
+    flags = _PID_PRESENT
+    strings = []
+    num, den = 0, 0
+    for field in _PID_STRING_FIELDS:
+        value = info.get(field)
+        if field == 'resolution' and isinstance(value, Fraction):
+            flags |= _PID_FRACTION
+            num, den = value.numerator, value.denominator
+            value = None
+        elif field == 'type' and isinstance(value, type):
+            if getattr(pid_types, value.__name__, None) is not value:
+                raise ValueError(f'PID {info["pid"]} type {value} is not defined in pid_types')
+            flags |= _PID_TYPE_CLASS
+            value = value.__name__
+        elif value is not None and not isinstance(value, str):
+            raise ValueError(f'Unsupported PID {info["pid"]} {field} value {value!r}')
+        strings.append(pool.add(value))
+
+    return _PID_RECORD.pack(flags, *strings, num, den)
+
+
+def compile_metadata():
+    """
+    Returns the packed metadata table built from the source modules.
+    """
+    from . import pid_info
+    from . import pid_name
+    from . import sid_consts
+
+    pool = _StringPool()
+
+    empty = _PID_RECORD.pack(0, *([_NO_STRING] * len(_PID_STRING_FIELDS)), 0, 0)
+    pid_info_section = b''.join(
+            _pack_pid_info(pid_info._pid_info[pid], pool) if pid in pid_info._pid_info else empty
+            for pid in range(_NUM_PIDS))
+
+    pid_name_section = b''.join(
+            _UINT16.pack(pool.add(pid_name._pids[pid] if pid in pid_name._pids else None))
+            for pid in range(_NUM_PIDS))
+
+    # SID tables are shared between MIDs the same way they are in sid_consts
+    mid_sid_strings = sid_consts._mid_sid_strings or sid_consts._build_sid_strings()
+    sid_tables = [sid_consts._default_sid_strings]
+    table_index = {id(sid_tables[0]): 0}
+    sid_mid_section = []
+    for mid in range(_NUM_MIDS):
+        strings = mid_sid_strings.get(mid)
+        if strings is None:
+            sid_mid_section.append(_UINT16.pack(0))
+            continue
+        if id(strings) not in table_index:
+            table_index[id(strings)] = len(sid_tables)
+            sid_tables.append(strings)
+        sid_mid_section.append(_UINT16.pack(table_index[id(strings)]))
+    sid_mid_section = b''.join(sid_mid_section)
+
+    sid_table_section = b''.join(
+            _UINT16.pack(pool.add(s)) for strings in sid_tables for s in strings)
+
+    encoded = [s.encode('utf-8') for s in pool.strings]
+    offsets = [0]
+    for s in encoded:
+        offsets.append(offsets[-1] + len(s))
+    offset_section = b''.join(_UINT32.pack(o) for o in offsets)
+    pool_section = b''.join(encoded)
+
+    sections = (offset_section, pool_section, pid_info_section, pid_name_section,
+                sid_mid_section, sid_table_section)
+    section_offsets = []
+    offset = _HEADER.size
+    for section in sections:
+        section_offsets.append(offset)
+        offset += len(section)
+
+    header = _HEADER.pack(_MAGIC, _VERSION, _source_digest(), len(encoded),
+                          len(sid_tables), *section_offsets)
+    return header + b''.join(sections)
+
+
+class PackedMetadata:
+    """
+    Lookups in a packed metadata table (see compile_metadata()), data can be
+    a bytes object or an mmap.
+    """
+    def __init__(self, data):
+        if len(data) < _HEADER.size:
+            raise ValueError('Packed metadata is truncated')
+
+        (magic, version, self.digest, self._num_strings, self._num_sid_tables,
+         self._offsets, self._pool, self._pid_info, self._pid_names,
+         self._sid_mids, self._sid_tables) = _HEADER.unpack_from(data)
+        if magic != _MAGIC or version != _VERSION:
+            raise ValueError(f'Unsupported packed metadata format {magic!r} version {version}')
+
+        end = self._sid_tables + self._num_sid_tables * _NUM_SIDS * _UINT16.size
+        if end > len(data):
+            raise ValueError('Packed metadata is truncated')
+
+        self._data = data
+
+        # Decoded strings and PID info dicts are kept so the same objects are 
+        # returned every time, the same way the source modules behave
+        self._strings = {}
+        self._pid_info_dicts = {}
+
+    def _string(self, index):
+        if index == _NO_STRING:
+            return None
+        try:
+            return self._strings[index]
+        except KeyError:
+            pass
+
+        start, end = struct.unpack_from('<II', self._data, self._offsets + index * _UINT32.size)
+        string = bytes(self._data[self._pool + start:self._pool + end]).decode('utf-8')
+        self._strings[index] = string
+        return string
+
+    def get_pid_info(self, pid):
+        """
+        Returns the same dict as pid_info.get_pid_info(), raises KeyError for
+        unknown PIDs.
+        """
+        try:
+            return self._pid_info_dicts[pid]
+        except KeyError:
+            pass
+
+        if not (isinstance(pid, int) and 0 <= pid < _NUM_PIDS):
+            raise KeyError(pid)
+        flags, *strings, num, den = _PID_RECORD.unpack_from(self._data, self._pid_info + pid * _PID_RECORD.size)
+        if not flags & _PID_PRESENT:
+            raise KeyError(pid)
+
+        info = {'pid': pid}
+        for field, index in zip(_PID_STRING_FIELDS, strings):
+            if field == 'resolution' and flags & _PID_FRACTION:
+                value = Fraction(num, den)
+            elif field == 'type' and flags & _PID_TYPE_CLASS:
+                from . import pid_types
+                value = getattr(pid_types, self._string(index))
+            else:
+                value = self._string(index)
+                if value is None:
+                    continue
+            info[field] = value
+
+        # Match the (alphabetical) key order of the source dicts
+        info = dict(sorted(info.items()))
+
+        self._pid_info_dicts[pid] = info
+        return info
+
+    def get_pid_name(self, pid):
+        """
+        Returns the name of a PID, or None if the PID is not known
+        """
+        if not (isinstance(pid, int) and 0 <= pid < _NUM_PIDS):
+            return None
+        (index,) = _UINT16.unpack_from(self._data, self._pid_names + pid * _UINT16.size)
+        return self._string(index)
+
+    def get_sid_string(self, mid, sid):
+        """
+        Returns the description of a SID for a MID, or None if the SID is not
+        known
+        """
+        if not (0 <= mid < _NUM_MIDS and 0 <= sid < _NUM_SIDS):
+            return None
+        (table,) = _UINT16.unpack_from(self._data, self._sid_mids + mid * _UINT16.size)
+        (index,) = _UINT16.unpack_from(self._data, self._sid_tables + (table * _NUM_SIDS + sid) * _UINT16.size)
+        return self._string(index)
+
+
+def load(path=_PACKED_PATH, check_sources=True):
+    """
+    Map a packed metadata file into memory.  Returns None if the file doesn't
+    exist, can't be read, or (if check_sources is set) was built from
+    different source modules.
+    """
+    try:
+        with open(path, 'rb') as f:
+            data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        packed = PackedMetadata(data)
+    except (OSError, ValueError, struct.error):
+        return None
+
+    if check_sources:
+        try:
+            if packed.digest != _source_digest():
+                return None
+        except OSError:
+            # If the sources are not installed the table can't be checked
+            pass
+    return packed
+
+
+# The packed table, or False if it is not available and the source modules 
+# should be used.  Loaded the first time it is needed.
+_packed = None
+
+
+def _get_packed():
+    global _packed
+    if _packed is None:
+        _packed = load() or False
+    return _packed
+
+
+def _get_pid_value(pid):
+    if hasattr(pid, 'pid'):
+        return pid.pid
+    elif isinstance(pid, dict):
+        return pid['pid']
+    else:
+        return pid
+
+
+def get_pid_info(pid):
+    pid_val = _get_pid_value(pid)
+    packed = _get_packed()
+    if packed:
+        return packed.get_pid_info(pid_val)
+
+    from . import pid_info
+    return pid_info._pid_info[pid_val]
+
+
+def get_pid_name(pid):
+    pid_val = _get_pid_value(pid)
+    packed = _get_packed()
+    if packed:
+        name = packed.get_pid_name(pid_val)
+        if name is not None:
+            return name
+        return f'Unknown PID {pid_val}'
+
+    from . import pid_name
+    return pid_name.get_pid_name(pid_val)
+
+
+def get_sid_string(mid, sid):
+    mid_value = mids.get_mid_value(mid)
+    packed = _get_packed()
+    if packed:
+        sid_str = packed.get_sid_string(mid_value, sid)
+        if sid_str is not None:
+            return sid_str
+        return f'Unknown SID {sid} for MID {mid_value}'
+
+    from . import sid_consts
+    return sid_consts.get_sid_string(mid_value, sid)
+
+
+# Periodic broadcast rates start with the period: "1.0 s", "500 msec", 
+# "0.2 s, or on state change", ...
+_period_pat = re.compile(r'^([0-9]+(?:\.[0-9]+)?) ?(s|sec|ms|msec)\b')
+
+
+def get_pid_period(pid):
+    """
+    Returns the broadcast period of a PID in seconds, or None if the PID is not
+    broadcast periodically (or unknown).
+    """
+    try:
+        info = get_pid_info(pid)
+    except KeyError:
+        return None
+    if 'period' not in info:
+        return None
+
+    match = _period_pat.match(info['period'])
+    if match is None:
+        return None
+
+    value, units = match.groups()
+    if units in ('ms', 'msec'):
+        return float(value) / 1000
+    return float(value)
+
+
+__all__ = [
+    'compile_metadata',
+    'PackedMetadata',
+    'load',
+    'get_pid_info',
+    'get_pid_name',
+    'get_sid_string',
+    'get_pid_period',
+]
@@ -184,8 +184,17 @@ def get_mid_name(mid):
     except KeyError:
         return f'Unknown MID {mid_val}'
 
+def decode_from(data, offset=0):
+    # Every MID byte has an interned J1708MID, only create it the first time 
+    # the MID is seen
+    mid = _interned[data[offset]]
+    if mid is None:
+        mid = J1708MID(data[offset])
+    return (mid, offset + 1)
+
+
 def decode(data):
-    return (J1708MID(data[0]), data[1:])
+    return (decode_from(data)[0], data[1:])
 
 
 def encode(mid):
@@ -197,15 +206,44 @@ def encode(mid):
         return struct.pack('>B', mid)
 
 
+# The J1708MID objects for MIDs 0-255, indexed by MID.  Filled in as each MID 
+# is created.
+_interned = [None] * 256
+
+
 class J1708MID:
-    def __init__(self, mid=None):
+    """
+    J1708MID objects are immutable and there is only one object for each MID
+    from 0 to 255, J1708MID(128) always returns the same object so MIDs can be
+    compared by identity.
+    """
+    __slots__ = ('mid', 'name')
+
+    def __new__(cls, mid=None):
         if isinstance(mid, J1708MID):
-            mid = mid.mid
-        elif isinstance(mid, dict):
-            mid = mid['mid']
+            return mid
+        mid = get_mid_value(mid)
+
+        interned = type(mid) is int and 0 <= mid < len(_interned)
+        if interned and _interned[mid] is not None:
+            return _interned[mid]
+
+        self = super().__new__(cls)
+        object.__setattr__(self, 'mid', mid)
+        object.__setattr__(self, 'name', get_mid_name(mid))
+        if interned:
+            _interned[mid] = self
+        return self
+
+    def __setattr__(self, name, value):
+        raise AttributeError(f'{self.__class__.__name__} objects are immutable')
+
+    def __delattr__(self, name):
+        raise AttributeError(f'{self.__class__.__name__} objects are immutable')
 
-        self.mid = get_mid_value(mid)
-        self.name = get_mid_name(self.mid)
+    def __reduce__(self):
+        # Copies and unpickled objects are the interned object
+        return (self.__class__, (self.mid,))
 
     def __repr__(self):
         return f'{self.__class__.__name__}({self.mid})'
@@ -219,6 +257,7 @@ class J1708MID:
 
 
 __all__ = [
+    'decode_from',
     'decode',
     'encode',
     'is_valid',
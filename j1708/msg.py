@@ -1,5 +1,5 @@
+import binascii
 import time
-import string
 import re
 import struct
 import json
@@ -10,16 +10,17 @@ from j1708.exceptions import *
 
 
 def make_pid_dict_string(value, explicit_flags=False, **kwargs):
-    flags = values.pop('flags')
+    values = dict(value)
+    flags = values.pop('flags', None)
 
     pid_str = ''
-    for field, value in values:
-        pid_str += f'\n    {field}: {value}'
+    for field, field_value in values.items():
+        pid_str += f'\n    {field}: {field_value}'
 
     if flags:
         flag_str_list = []
         for flag in flags:
-            flag_str = str(f)
+            flag_str = str(flag)
             # unless explicit_flags is true, don't include "OFF" values
             if not flag_str.endswith('_OFF') or explicit_flags:
                 flag_str_list.append(flag_str)
@@ -73,7 +74,7 @@ def format_pid_value(value, **kwargs):
         return '\n    ' + value.format(**kwargs)
     elif isinstance(value, dict):
         return make_pid_dict_string(**kwargs, value=value)
-    elif isinstance(value, list):
+    elif isinstance(value, (list, tuple)):
         return make_pid_list_string(**kwargs, value=value)
     elif isinstance(value, bytes) or isinstance(value, bytearray):
         return make_pid_bytes_string(**kwargs, value=value)
@@ -81,16 +82,73 @@ def format_pid_value(value, **kwargs):
         return make_pid_string(**kwargs, value=value)
 
 
+# Characters that are removed from a message to check if it is printable hex
+_HEX_DIGITS = b'0123456789abcdefABCDEF'
+
+
+def _is_hex(data):
+    # translate() deletes the hex digits in one pass in C, if nothing is left 
+    # every character was a hex digit
+    return not data.translate(None, _HEX_DIGITS)
+
+
+def _validate_frame(data, ignore_checksum=False, msg_format=None):
+    """
+    Convert a received message to bytes and check the checksum, returns the
+    message and the checksum (None if the checksum is invalid and
+    ignore_checksum is set).
+    """
+    # The message format can be 'hex' (printable hex), 'bytes' or None if 
+    # the format should be identified from the message contents.
+    if msg_format is None:
+        is_hex = _is_hex(data)
+    elif msg_format in ('hex', 'bytes'):
+        is_hex = msg_format == 'hex'
+    else:
+        raise J1708Error(f'Invalid msg format {msg_format}')
+
+    if is_hex:
+        # Convert from printable hex to actual bytes, unhexlify() accepts 
+        # bytes or strings so no intermediate string has to be created
+        msg = binascii.unhexlify(data)
+    else:
+        msg = data
+
+    # If the message is valid calculating a checksum over the message and 
+    # current checksum will add up to 0.
+    if len(msg) >= 2 and sum(msg) & 0xFF == 0:
+        return msg, msg[-1]
+    elif ignore_checksum:
+        return msg, None
+    else:
+        raise J1708ChecksumError(f'Invalid checksum {msg[-1]} for msg {msg[:-1].hex()}')
+
+
 class J1708:
-    def __init__(self, msg=None, timestamp=None, mid=None, pids=None, decode=True, ignore_checksum=False, rate=None, pid=None):
+    # Captures can hold millions of messages so they don't have a __dict__
+    __slots__ = ('_raw', 'msg', 'checksum', '_mid', '_pids', 'rate', '_lazy', '_cache', 'time')
+
+    def __init__(self, msg=None, timestamp=None, mid=None, pids=None, decode=True, ignore_checksum=False, rate=None, pid=None, msg_format=None, lazy=False, cache=None):
         # Save msg if it was provided
         self._raw = msg
         self.msg = None
         self.checksum = None
         self._mid = None
-        self._pids = {}
+
+        # The PIDs are stored as a tuple of J1708PID objects, or a LazyPIDs 
+        # mapping if they are decoded when they are accessed
+        self._pids = ()
         self.rate = rate
 
+        # When lazy is set the PIDs in a received message are not decoded 
+        # until they are accessed
+        self._lazy = lazy
+
+        # Optional LRU cache of decoded messages keyed by the raw message 
+        # bytes.  Decoded J1708PID objects are shared between all messages 
+        # with the same contents so they must not be modified in place.
+        self._cache = cache
+
         if timestamp is None:
             self.time = time.time()
         else:
@@ -118,7 +176,7 @@ class J1708:
                 self._init_pids([pids])
 
         elif msg is not None:
-            self._init_from_msg(msg, ignore_checksum=ignore_checksum)
+            self._init_from_msg(msg, ignore_checksum=ignore_checksum, msg_format=msg_format)
             if decode:
                 self.decode()
 
@@ -126,13 +184,26 @@ class J1708:
             raise J1708Error('Must supply "msg" or "mid" and "pids" params to create {self.__class__.__name__} object')
 
     def _init_pids(self, pid_list):
+        pids = {}
         for value in pid_list:
             pid = j1708_pids.J1708PID(value)
-            self._pids[pid.pid] = pid
+            pids[pid.pid] = pid
+        self._pids = tuple(pids.values())
+
+    def _get_pid(self, key):
+        if isinstance(self._pids, tuple):
+            # Messages only have a few PIDs so a linear search is fast enough
+            for pid in self._pids:
+                if pid.pid == key:
+                    return pid
+            raise KeyError(key)
+        return self._pids[key]
 
     @property
     def pids(self):
         # return a list of pids from the _pids
+        if isinstance(self._pids, tuple):
+            return self._pids
         return self._pids.values()
 
     @property
@@ -157,32 +228,41 @@ class J1708:
             return f'{self.__class__.__name__}(msg={repr(repr_msg)}, timestamp={repr(self.time)}, mid={self.mid}, pids={repr(list(self.pids))})'
 
     def __iter__(self):
+        if isinstance(self._pids, tuple):
+            return (pid.pid for pid in self._pids)
         return self._pids.__iter__()
 
     def __contains__(self, key):
+        if isinstance(self._pids, tuple):
+            for pid in self._pids:
+                if pid.pid == key:
+                    return True
+            return False
         return key in self._pids
 
     def __getitem__(self, key):
-        return self._pids[key].value
+        return self._get_pid(key).value
 
     def __setitem__(self, key, value):
-        if key in self._pids:
-            self._pids[key].value = value
+        # Replace the PID rather than changing its value because the existing 
+        # J1708PID object may be shared with other messages through the 
+        # decode cache
+        param = j1708_pids.J1708PID(pid=key, value=value)
+        if isinstance(self._pids, tuple):
+            if key in self:
+                self._pids = tuple(param if p.pid == key else p for p in self._pids)
+            else:
+                self._pids += (param,)
         else:
-            self._pids[key] = J1708PID(pid=key, value=value)
+            self._pids[key] = param
         # Because a PID's value has been changed, clear the current msg encoding
         self.msg = None
 
     @classmethod
     def calc_checksum(cls, msg):
-        chksum = 0
-        for char in msg:
-            chksum = (chksum + char) & 0xFF
-
-        if chksum != 0:
-            # Determine what the checksum _should_ be
-            chksum = 0x100 - chksum
-        return chksum
+        # The checksum is the two's complement of the sum of the message, so a 
+        # message that includes a valid checksum adds up to 0
+        return -sum(msg) & 0xFF
 
     def update_checksum(self):
         self.checksum = self.calc_checksum(self.msg)
@@ -191,47 +271,84 @@ class J1708:
         # integer to a single byte
         self.msg += struct.pack('>B', self.checksum)
 
-    def _init_from_msg(self, data, ignore_checksum=False):
-        if all(chr(c) in string.hexdigits for c in data):
-            # Convert from printable hex to actual bytes
-            if isinstance(data, bytes) or isinstance(data, bytearray):
-                msg = bytes.fromhex(data.decode('latin-1'))
-            else:
-                msg = bytes.fromhex(data)
-        else:
-            msg = data
-
-        # If the message is valid calculating a checksum over the message and 
-        # current checksum will add up to 0.
-        if len(msg) >= 2 and self.calc_checksum(msg) == 0:
-            self.msg = msg
-            self.checksum = msg[-1]
-        elif ignore_checksum:
-            self.msg = msg
-        else:
-            raise J1708ChecksumError(f'Invalid checksum {msg[-1]} for msg {msg[:-1].hex()}')
+    def _init_from_msg(self, data, ignore_checksum=False, msg_format=None):
+        self.msg, self.checksum = _validate_frame(data, ignore_checksum=ignore_checksum, msg_format=msg_format)
+
+    @classmethod
+    def from_validated(cls, raw, timestamp, checksum, decode=True, lazy=False, cache=None):
+        """
+        Create a message from raw bytes (including the checksum) that have
+        already been checked.  Nothing is checked again: checksum is the
+        checksum byte of a valid message, or None if the message is invalid.
+        If timestamp is None the current time is used.
+        """
+        self = cls.__new__(cls)
+        self._raw = raw
+        self.msg = raw
+        self.checksum = checksum
+        self._mid = None
+        self._pids = ()
+        self.rate = None
+        self._lazy = lazy
+        self._cache = cache
+        self.time = time.time() if timestamp is None else timestamp
+
+        if decode:
+            self.decode()
+        return self
+
+    @classmethod
+    def from_frame(cls, frame, msg_format=None, timestamp=None, ignore_checksum=False, decode=True, lazy=False, cache=None):
+        """
+        Create a message from a frame received from a J1708 device.  The frame
+        is converted and checked once and then passed to from_validated().
+        """
+        msg, checksum = _validate_frame(frame, ignore_checksum=ignore_checksum, msg_format=msg_format)
+        return cls.from_validated(msg, timestamp, checksum, decode=decode, lazy=lazy, cache=cache)
 
     def is_valid(self):
-        return self.checksum is not None
+        # Messages merged from multisection messages don't have a checksum of 
+        # their own, each section was checked when it was received
+        return self.checksum is not None or isinstance(self._raw, tuple)
 
     def decode(self):
         if self._mid is None:
-            self._mid, rest = j1708_mids.decode(self.msg)
-
-            # assume the last byte of the message is the checksum
-            body = rest[:-1]
-            self._pids.update(j1708_pids.decode_msg(body))
+            if self._cache is not None:
+                # Repeated messages are very common, if this message has 
+                # already been decoded use the cached PIDs.  The PID tuple 
+                # can't be modified so it can be shared.
+                key = bytes(self.msg)
+                cached = self._cache.get(key)
+                if cached is not None:
+                    self._mid, self._pids = cached
+                    return
+
+            self._mid, offset = j1708_mids.decode_from(self.msg)
+
+            # assume the last byte of the message is the checksum, the PIDs are 
+            # decoded in place rather than from a copy of the message body.  
+            # Messages that are cached are always fully decoded.
+            lazy = self._lazy and self._cache is None
+            pids = j1708_pids.decode_msg(self.msg, offset, len(self.msg) - 1, lazy=lazy)
+            if not lazy:
+                pids = tuple(pids.values())
+            self._pids = pids
+
+            if self._cache is not None:
+                self._cache.put(key, (self._mid, self._pids))
 
     @property
     def is_multisection(self):
-        if 192 in self._pids or 448 in self._pids:
+        if 192 in self or 448 in self:
             if len(self._pids) != 1:
                 errmsg = f'Multisection msgs should only have 1 PID ({repr(self)})'
                 raise J1708MultisectionError(errmsg)
 
             # Last sanity check, ensure that the pid type is correct
-            param_id = 192 if 192 in self._pids else 448
-            if not isinstance(self._pids[param_id].value, j1708_pids.MultisectionParam):
+            from .pid_types import MultisectionParam
+
+            param_id = 192 if 192 in self else 448
+            if not isinstance(self[param_id], MultisectionParam):
                 errmsg = f'Incorrect multisection msg PID type ({repr(self)})'
                 raise J1708MultisectionError(errmsg)
 
@@ -242,14 +359,14 @@ class J1708:
     @property
     def section(self):
         if self.is_multisection:
-            param_id = 192 if 192 in self._pids else 448
-            return self._pids[param_id].value
+            param_id = 192 if 192 in self else 448
+            return self[param_id]
         return None
 
     def format_for_log(self, explicit_flags=False):
         self.decode()
         out = f'{self._mid.name} ({self._mid.mid}): {self}'
-        for pid in self._pids.values():
+        for pid in self.pids:
             out += f'\n  {pid.pid}: {pid.name}'
             out += format_pid_value(mid=self.mid, pid=pid, value=pid.value, explicit_flags=explicit_flags)
         return out
@@ -259,7 +376,7 @@ class J1708:
         # a message
         if self.msg is None:
             self.msg = j1708_mids.encode(self.mid)
-            self.msg += b''.join(j1708_pids.encode(p) for p in self._pids.values())
+            self.msg += b''.join(j1708_pids.encode(p) for p in self.pids)
             self.update_checksum()
 
         elif not self.is_valid():
@@ -274,11 +391,15 @@ class J1708:
     def __str__(self):
         if self.msg is not None:
             msg = self.msg.hex()
+        elif isinstance(self._raw, tuple):
+            # Merged multisection messages are displayed as their sections
+            msg = ' '.join(m if isinstance(m, str) else m.hex() for m in self._raw)
         elif self._raw is not None:
             msg = self._raw
         else:
             # Need to encode this msg before we can display it
             self.encode()
+            msg = self.msg.hex()
 
         if self.checksum is not None:
             return f'{msg.upper()} ({self.checksum:X})'
@@ -292,7 +413,7 @@ class J1708:
             'mid': self.mid,
             'src': self.src,
             'checksum': self.checksum,
-            'pids': [p.export(mid=self._mid) for p in self._pids.values()],
+            'pids': [p.export(mid=self._mid) for p in self.pids],
         }
 
         if self.msg is not None:
@@ -334,7 +455,7 @@ class J1708MultisectionMsg:
 
         # If messages were provided add them now
         if msgs is not None:
-            if isinstance(msgs, msgs):
+            if isinstance(msgs, dict):
                 msgs = [m for m in msgs.values() if m is not first]
             elif isinstance(msgs, (list, tuple)):
                 msgs = [m for m in msgs if m is not first]
@@ -387,7 +508,8 @@ class J1708MultisectionMsg:
             errmsg = f'Cannot merge, section(s) missing: {repr(self._msgs)}'
             raise J1708MultisectionError(errmsg)
 
-        sections = [m.section for m in self._msgs.values()]
+        # Sections may have been received in any order
+        sections = [self._msgs[cur].section for cur in sorted(self._msgs)]
         merged = b''.join(s.data for s in sections)
 
         if len(merged) != self._first.section.size:
@@ -415,7 +537,7 @@ class J1708MultisectionMsg:
             'timestamp': last_msg.time,
 
             # Pass raw message sections to the object being created
-            'msg': tuple(m.msg for m in self._msgs.values()),
+            'msg': tuple(self._msgs[cur].msg for cur in sorted(self._msgs)),
         }
         return J1708(**args)
 
@@ -0,0 +1,221 @@
+import collections
+
+from .msg import J1708MultisectionMsg
+from .exceptions import *
+
+
+class _Transfer:
+    """
+    The sections of one multisection parameter that have been received so
+    far, indexed by section number.
+    """
+    __slots__ = ('sections', 'last', 'size', 'updated')
+
+    def __init__(self, last):
+        self.sections = {}
+        self.last = last
+
+        # Number of message bytes held by this transfer
+        self.size = 0
+
+        # Time the most recent section was received
+        self.updated = None
+
+    def add(self, cur, msg):
+        old = self.sections.get(cur)
+        if old is not None:
+            self.size -= len(old.msg)
+        self.sections[cur] = msg
+        self.size += len(msg.msg)
+        self.updated = msg.time
+
+    @property
+    def complete(self):
+        return len(self.sections) == self.last + 1
+
+
+class MultisectionReassembler:
+    """
+    Reassembles multisection parameters (PID 192 and 448) from a stream of
+    decoded J1708 messages.  Each (source, MID, PID) being transferred is
+    tracked separately, sections can be received in any order and duplicate
+    sections are ignored.  When all sections of a parameter have been
+    received they are merged (see J1708MultisectionMsg) into a new J1708
+    message:
+
+        reassembler = MultisectionReassembler()
+        for msg in reassembler.reassemble(iface_msgs):
+            ...
+
+    Incomplete transfers are discarded if no new section is received within
+    timeout seconds (using the message times), or if the sections held by
+    all transfers would use more than max_bytes.
+
+    Counters:
+        completed:  number of parameters that were merged
+        expired:    number of incomplete transfers that timed out
+        dropped:    number of incomplete transfers discarded to stay under
+                    max_bytes, or because a new transfer of the same
+                    parameter started
+        errors:     number of transfers or sections that could not be
+                    merged
+    """
+    def __init__(self, timeout=5.0, max_bytes=4096):
+        if timeout <= 0:
+            raise ValueError(f'Invalid multisection timeout {timeout}')
+        if max_bytes < 1:
+            raise ValueError(f'Invalid multisection max_bytes {max_bytes}')
+
+        self.timeout = timeout
+        self.max_bytes = max_bytes
+
+        # (source, MID, PID) -> _Transfer, ordered by the time the last 
+        # section of each transfer was received so the oldest transfers can 
+        # be found quickly
+        self._transfers = collections.OrderedDict()
+        self._size = 0
+
+        self.completed = 0
+        self.expired = 0
+        self.dropped = 0
+        self.errors = 0
+
+    def __len__(self):
+        return len(self._transfers)
+
+    @property
+    def size(self):
+        """
+        Number of message bytes held by incomplete transfers
+        """
+        return self._size
+
+    def _remove(self, key):
+        transfer = self._transfers.pop(key)
+        self._size -= transfer.size
+        return transfer
+
+    def expire(self, now):
+        """
+        Discard transfers that have not received a section since now - timeout
+        """
+        while self._transfers:
+            key, transfer = next(iter(self._transfers.items()))
+            if now - transfer.updated <= self.timeout:
+                break
+            self._remove(key)
+            self.expired += 1
+
+    def clear(self):
+        self._transfers.clear()
+        self._size = 0
+
+    def feed(self, msg, source=None):
+        """
+        Process one message, returns a list of the messages merged because of
+        it (empty unless msg is the last missing section of a parameter).
+        When messages are received from several devices the source should
+        identify the device so sections from different buses are not mixed.
+        """
+        if msg.time is not None:
+            self.expire(msg.time)
+
+        # Messages merged from sections don't have a raw message and are 
+        # never sections of another parameter, even if the merged data 
+        # happens to be a multisection PID
+        if msg.msg is None:
+            return []
+
+        try:
+            if not msg.is_multisection:
+                return []
+        except J1708MultisectionError:
+            self.errors += 1
+            return []
+
+        section = msg.section
+        key = (source, msg.mid, section.pid)
+        transfer = self._transfers.get(key)
+
+        if transfer is not None:
+            if section.last != transfer.last:
+                # This section is from a different transfer of the same
+                # parameter, the old transfer can't be completed now
+                self._remove(key)
+                self.dropped += 1
+                transfer = None
+            elif section.cur in transfer.sections:
+                old = transfer.sections[section.cur]
+                if old.msg == msg.msg:
+                    # Duplicate section, only update the time
+                    transfer.updated = msg.time
+                    self._transfers.move_to_end(key)
+                    return []
+                elif section.cur == 0:
+                    # A new transfer of the same parameter started
+                    self._remove(key)
+                    self.dropped += 1
+                    transfer = None
+
+        if section.cur > section.last:
+            self.errors += 1
+            return []
+
+        if transfer is None:
+            transfer = _Transfer(section.last)
+            self._transfers[key] = transfer
+
+        self._size -= transfer.size
+        transfer.add(section.cur, msg)
+        self._size += transfer.size
+        self._transfers.move_to_end(key)
+
+        if transfer.complete:
+            self._remove(key)
+            return self._merge(transfer)
+
+        # Discard the oldest transfers if too much data is being held
+        while self._size > self.max_bytes:
+            self._remove(next(iter(self._transfers)))
+            self.dropped += 1
+        return []
+
+    def _merge(self, transfer):
+        first = transfer.sections[0]
+        others = [m for cur, m in transfer.sections.items() if cur != 0]
+        try:
+            merged = J1708MultisectionMsg(first, others).merge()
+        except Exception:
+            # The merged data is decoded by the PID type decoders which can 
+            # fail in many ways on malformed data, that shouldn't stop the 
+            # message stream
+            self.errors += 1
+            return []
+
+        self.completed += 1
+        return [merged]
+
+    def reassemble(self, msgs):
+        """
+        Yield each message in msgs, followed by any message merged because of
+        it
+        """
+        for msg in msgs:
+            yield msg
+            if msg is not None:
+                yield from self.feed(msg)
+
+    def stats(self):
+        return {
+            'completed': self.completed,
+            'expired': self.expired,
+            'dropped': self.dropped,
+            'errors': self.errors,
+            'in_progress': len(self._transfers),
+            'size': self._size,
+        }
+
+
+__all__ = [
+    'MultisectionReassembler',
+]
@@ -2,6 +2,7 @@ from fractions import Fraction
 
 from .utils import RangeDict
 from . import pid_types
+from .metadata import get_pid_period
 
 
 _pid_info = {
@@ -3894,4 +3895,5 @@ def get_pid_info(pid):
 
 __all__ = [
     'get_pid_info',
+    'get_pid_period',
 ]
@@ -3,8 +3,7 @@ import functools
 import struct
 
 from . import mids
-from . import pid_name
-from . import sid_consts
+from . import metadata
 from .exceptions import *
 
 
@@ -15,6 +14,51 @@ def get_mask_offset(mask):
     return count
 
 
+class ScaledValue:
+    """
+    Numeric PID value that has been scaled by the PID's resolution.  The value 
+    is only turned into text when it is displayed.
+    """
+    __slots__ = ('value', 'units', 'raw')
+
+    def __init__(self, value, units=None, raw=None):
+        self.value = value
+        self.units = units
+        self.raw = raw
+
+    def __repr__(self):
+        return f'{self.__class__.__name__}(value={self.value!r}, units={self.units!r}, raw={self.raw!r})'
+
+    def __str__(self):
+        return self.format()
+
+    def __float__(self):
+        return float(self.value)
+
+    def __eq__(self, other):
+        if isinstance(other, ScaledValue):
+            return (self.value, self.units, self.raw) == (other.value, other.units, other.raw)
+        return NotImplemented
+
+    def export(self):
+        # Export the number, the units are exported with the PID
+        return self.value
+
+    def format(self, **kwargs):
+        out = str(self.value)
+        if self.units is not None:
+            out += f' {self.units}'
+        if self.raw is not None:
+            out += f' ({self.raw.hex().upper()})'
+        return out
+
+
+# Decoded flags for each flag enum class, indexed by the raw value.  Status 
+# PIDs are broadcast constantly with only a few different values so the table 
+# for a class is filled in as values are decoded rather than all at once.
+_flag_tables = {}
+
+
 class J1708FlagEnum(enum.IntFlag):
     def __repr__(self):
         return f'{self.__class__.__name__}({self.value})'
@@ -40,18 +84,32 @@ class J1708FlagEnum(enum.IntFlag):
 
     @classmethod
     def _get_flags(cls, value):
-        flags = []
-        for flag in list(cls):
-            #if flag in value:
-            if flag in value:
-                flags.append(flag)
-        return flags
+        return tuple(flag for flag in cls if value in flag)
+
+    @classmethod
+    def _decode_value(cls, value):
+        return cls._get_flags(value)
+
+    @classmethod
+    def _lookup(cls, value):
+        # Values are only decoded the first time they are seen, the decoded 
+        # values are shared so they must not be modified
+        table = _flag_tables.get(cls)
+        if table is None:
+            table = _flag_tables.setdefault(cls, {})
+
+        try:
+            return table[value]
+        except KeyError:
+            decoded = cls._decode_value(value)
+            table[value] = decoded
+            return decoded
 
     @classmethod
     def decode(cls, value):
         if isinstance(value, bytes) or isinstance(value, bytearray):
             value = int.from_bytes(value, 'little')
-        return cls._get_flags(value)
+        return cls._lookup(value)
 
     @classmethod
     def encode(cls, flags):
@@ -78,7 +136,7 @@ class StatusGroupEnum(J1708FlagEnum):
                 raise ValueError(errmsg)
         return obj
 
-    def _contains__(self, other):
+    def __contains__(self, other):
         # Customize the "in" operator to ensure that mask group enums only
         # validate the specific section of the value.
         if int(other) & self.mask == self.value & self.mask:
@@ -175,7 +233,7 @@ class StatusGroupEnumAndValue(StatusGroupEnum):
         if self.is_value_field:
             # for the bitwise-and operator just mask out the field from the
             # value specified
-            return value & self.mask
+            return other & self.mask
         else:
             return super().__and__(other)
 
@@ -192,20 +250,12 @@ class StatusGroupEnumAndValue(StatusGroupEnum):
 
     @classmethod
     def _get_flags(cls, value):
-        matches = []
-        for flag in list(cls):
-            #if not flag.is_value_field and flag in value:
-            if not flag.is_value_field and value in flag:
-                matches.append(flag)
-        return matches
+        return tuple(flag for flag in cls if not flag.is_value_field and value in flag)
 
     @classmethod
-    def decode(cls, value):
-        if isinstance(value, bytes):
-            value = int.from_bytes(val_bytes, 'little')
-
+    def _decode_value(cls, value):
         obj = {}
-        for field in list(cls):
+        for field in cls:
             if field.is_value_field:
                 obj[field.name] = (value & field.mask) >> field._field_offset
 
@@ -213,6 +263,14 @@ class StatusGroupEnumAndValue(StatusGroupEnum):
         obj['flags'] = cls._get_flags(value)
         return obj
 
+    @classmethod
+    def decode(cls, value):
+        if isinstance(value, bytes) or isinstance(value, bytearray):
+            value = int.from_bytes(value, 'little')
+
+        # Return a copy so the cached dict isn't modified
+        return dict(cls._lookup(value))
+
     @classmethod
     def encode(cls, flags, **kwargs):
         # the flags could also be supplied as a dictionary to allow setting
@@ -423,7 +481,7 @@ class ParamRequest:
         return f'{self.__class__.__name__}(pid={self.pid}, mid={self.mid.mid})'
 
     def format(self, **kwargs):
-        pid_str = pid_name.get_pid_name(self.pid)
+        pid_str = metadata.get_pid_name(self.pid)
         return f'PID {self.pid} ({pid_str}) FROM {self.mid.mid} ({self.mid.name})'
 
     @classmethod
@@ -531,6 +589,8 @@ class EngineRetarderStatus(StatusGroupEnum):
 class MultisectionParam:
     # I'd call this a "multisegment" parameter, but the J1708 standard calls it
     # "multisection" so that's what it is called
+    __slots__ = ('pid', 'cur', 'last', 'data', 'size')
+
     def __init__(self, pid, cur, last, data, size=None):
         self.pid = pid
         self.cur = cur
@@ -591,29 +651,33 @@ class DTCCode(StatusGroupEnumAndValue):
 
 
 class DTC:
+    __slots__ = ('_code_value', '_pid_sid_byte', 'ext', 'pid', 'sid', 'active', 'count', 'fmi')
+
     def __init__(self, pid_sid_byte, code, count=None):
-        self._code = DTCCode.decode(code)
+        # Only the code byte is kept, it is decoded again if it is needed
+        self._code_value = code
         self._pid_sid_byte = pid_sid_byte
+        decoded = DTCCode.decode(code)
 
-        if DTCCode.EXTENDED in self._code['flags']:
+        if DTCCode.EXTENDED in decoded['flags']:
             self.ext = True
             pid_sid_byte += 256
         else:
             self.ext = False
 
-        if DTCCode.SID_INCL in self._code['flags']:
+        if DTCCode.SID_INCL in decoded['flags']:
             self.pid = None
             self.sid = pid_sid_byte
         else:
             self.pid = pid_sid_byte
             self.sid = None
 
-        if DTCCode.ACTIVE in self._code['flags']:
+        if DTCCode.ACTIVE in decoded['flags']:
             self.active = True
         else:
             self.active = False
 
-        if DTCCode.COUNT_INCL in self._code['flags']:
+        if DTCCode.COUNT_INCL in decoded['flags']:
             assert count is not None
             if isinstance(count, int):
                 self.count = count
@@ -623,7 +687,11 @@ class DTC:
         else:
             self.count = None
 
-        self.fmi = FMI(self._code['FMI'])
+        self.fmi = FMI(decoded['FMI'])
+
+    @property
+    def _code(self):
+        return DTCCode.decode(self._code_value)
 
     def __repr__(self):
         return f'{self.__class__.__name__}(pid_sid_byte={self._pid_sid_byte}, code={repr(self._code)}, count={self.count})'
@@ -634,10 +702,10 @@ class DTC:
         else:
             value_str = 'INACTIVE '
         if self.sid is not None:
-            sid_str = sid_consts.get_sid_string(mid, self.sid)
+            sid_str = metadata.get_sid_string(mid, self.sid)
             value_str += f'SID {self.sid} ({sid_str}): '
         else:
-            pid_str = pid_name.get_pid_name(self.pid)
+            pid_str = metadata.get_pid_name(self.pid)
             value_str += f'PID {self.pid} ({pid_str}): '
         value_str += self.fmi.name
         if self.count is not None:
@@ -720,10 +788,10 @@ class DTCRequest:
             return f'{self.type.name} {self._mid.name} ({self._mid.mid})'
         else:
             if self.sid is not None:
-                sid_str = sid_consts.get_sid_string(self.mid, self.sid)
+                sid_str = metadata.get_sid_string(self.mid, self.sid)
                 return f'{self.type.name} {self._mid.name} ({self._mid.mid}): SID {self.sid} ({sid_str})'
             else:
-                pid_str = pid_name.get_pid_name(self.pid)
+                pid_str = metadata.get_pid_name(self.pid)
                 return f'{self.type.name} {self._mid.name} ({self._mid.mid}): PID {self.pid} ({pid_str})'
 
     @classmethod
@@ -863,10 +931,10 @@ class DTCResponse:
             return f'{self.type.name}'
         elif self.type == DTC_RESP_TYPE.DTC_CLEARED:
             if self.sid is not None:
-                sid_str = sid_consts.get_sid_string(mid, self.sid)
+                sid_str = metadata.get_sid_string(mid, self.sid)
                 return f'{self.type.name} SID {self.sid} ({sid_str})'
             else:
-                pid_str = pid_name.get_pid_name(self.pid)
+                pid_str = metadata.get_pid_name(self.pid)
                 return f'{self.type.name} PID {self.pid} ({pid_str})'
         elif self.type == DTC_RESP_TYPE.ASCII_RESPONSE:
             ascii_resp = self.info.decode('latin-1')
@@ -885,13 +953,16 @@ class DTCResponse:
 
 # PID: 448
 class Page2MultisectionParam(MultisectionParam):
-    def __init__(self, pid, cur, last, data, orig_size=None):
-        super().__init(pid, cur, last, data, orig_size)
+    __slots__ = ()
+
+    def __init__(self, pid, cur, last, data, size=None):
+        super().__init__(pid, cur, last, data, size)
         # add 256 to the PID
         self.pid += 256
 
 
 __all__ = [
+    'ScaledValue',
     'J1708FlagEnum',
     'StatusGroupEnum',
     'StatusGroupEnumAndValue',
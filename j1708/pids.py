@@ -1,11 +1,14 @@
+import collections.abc
 import struct
 from fractions import Fraction
 
-from .pid_types import *
-from . import pid_name
-from . import pid_info
+from . import metadata
 from .exceptions import *
 
+# The PID information (see metadata) and pid_types are large, they are only 
+# loaded when a PID value is decoded or encoded so that programs that don't 
+# decode messages start faster.
+
 
 def genBitMask(bits):
     return ~((-1) << bits)
@@ -95,136 +98,237 @@ def get_pid_value(pid):
         return pid
 
 
-def decode(data, pid=None):
+# Integer PID values are little-endian
+_UNSIGNED_STRUCTS = {
+    1: struct.Struct('<B'),
+    2: struct.Struct('<H'),
+    4: struct.Struct('<L'),
+    8: struct.Struct('<Q'),
+}
+
+_SIGNED_STRUCTS = {
+    1: struct.Struct('<b'),
+    2: struct.Struct('<h'),
+    4: struct.Struct('<l'),
+    8: struct.Struct('<q'),
+}
+
+
+class _ScaledPIDDecoder:
+    """
+    Decodes integer PID values and scales them by the PID's resolution
+    """
+    __slots__ = ('pid', '_structs', '_num', '_den', '_units', '_value_type')
+
+    def __init__(self, pid, signed, resolution, units=None):
+        from .pid_types import ScaledValue
+
+        self.pid = pid
+        self._value_type = ScaledValue
+        self._structs = _SIGNED_STRUCTS if signed else _UNSIGNED_STRUCTS
+
+        # The value is calculated as (raw * numerator) / denominator, integer 
+        # true division is correctly rounded so this gives exactly the same 
+        # result as float(raw * resolution) without creating a Fraction.
+        self._num = resolution.numerator
+        self._den = resolution.denominator
+        self._units = units
+
+    def __call__(self, val_bytes):
+        unpacker = self._structs.get(len(val_bytes))
+        if unpacker is None:
+            raise J1708DecodeError(f'Bad size {len(val_bytes)} for encoding PID {self.pid} = {val_bytes.hex()}')
+
+        fractional_val = unpacker.unpack(val_bytes)[0] * self._num / self._den
+        return self._value_type(fractional_val, self._units, val_bytes)
+
+
+def _raw_value(val_bytes):
+    return val_bytes
+
+
+def _hex_value(val_bytes):
+    return val_bytes.hex().upper()
+
+
+def _make_pid_decoder(pid, info):
+    """
+    Returns the function used to decode (non-empty) values of a PID
+    """
+    if 'resolution' not in info:
+        # There is no specific encoding for this PID, so just make the value 
+        # the hex bytes
+        return _hex_value
+
+    elif isinstance(info['resolution'], Fraction):
+        # First byte swap the data (it's in little endian) and then multiply 
+        # by the resolution
+        return _ScaledPIDDecoder(pid, info['type'].startswith('signed'), info['resolution'], info.get('units'))
+
+    elif hasattr(info.get('type'), 'decode'):
+        return info['type'].decode
+
+    else:
+        return _raw_value
+
+
+# Decoders for all possible PIDs (0-1023), indexed by PID.  Built the first 
+# time a PID is decoded.
+_decoders = None
+
+
+def _build_decoders():
+    global _decoders
+    decoders = [None] * 1024
+    for pid in range(len(decoders)):
+        try:
+            info = metadata.get_pid_info(pid)
+        except KeyError:
+            continue
+        decoders[pid] = _make_pid_decoder(pid, info)
+
+    _decoders = decoders
+    return decoders
+
+
+def find_pid(data, offset=0, end=None, pid=None):
+    """
+    Find the PID that starts at offset in data without decoding it.  Returns
+    the PID number and the start and end offsets of the PID value, or None if
+    there is no valid PID at offset.  The PID data must end before end
+    (default len(data)).
+    """
+    if end is None:
+        end = len(data)
+    msg_end = end
+
     if pid is None:
-        if len(data) >= 4 and data[:3] == b'\xff\xff\xff':
-            pid_char = data[3]
+        avail = msg_end - offset
+        if avail >= 4 and data[offset] == 0xff and data[offset + 1] == 0xff and data[offset + 2] == 0xff:
+            pid_char = data[offset + 3]
             pid_val = 768 + pid_char
-            start = 4
-        elif len(data) >= 3 and data[:2] == b'\xff\xff':
-            pid_char = data[2]
+            start = offset + 4
+        elif avail >= 3 and data[offset] == 0xff and data[offset + 1] == 0xff:
+            pid_char = data[offset + 2]
             pid_val = 512 + pid_char
-            start = 3
-        elif len(data) >= 2 and data[:1] == b'\xff':
-            pid_char = data[1]
+            start = offset + 3
+        elif avail >= 2 and data[offset] == 0xff:
+            pid_char = data[offset + 1]
             pid_val = 256 + pid_char
-            start = 2
-        elif len(data) >= 1 and data[:1] != b'\xff':
-            pid_char = data[0]
+            start = offset + 2
+        elif avail >= 1 and data[offset] != 0xff:
+            pid_char = data[offset]
             pid_val = pid_char
-            start = 1
+            start = offset + 1
         else:
             # Invalid
-            return (None, data)
+            return None
     else:
         # Used to make it easier to decode multi-section message contents
         pid_val = get_pid_value(pid)
         pid_char = pid_val % 256
-        start = 0
+        start = offset
 
-    if pid_char in range(0, 128):
+    if pid_char < 128:
         data_len = 1
         end = start + data_len
-    elif pid_char in range(128, 192):
+    elif pid_char < 192:
         data_len = 2
         end = start + data_len
     elif pid_char == 254:
         # The rest of the message is the data
-        end = len(data)
-        data_len = len(data[start:])
-    else:
+        end = msg_end
+        data_len = end - start
+    elif start < msg_end:
         # Variable length, the first data char is the length
         data_len = data[start]
         start += 1
         end = start + data_len
+    else:
+        raise J1708DecodeError(f'Missing data length for PID {pid_val}')
 
-    val_bytes = data[start:end]
-
-    # Ensure that the bytes extracted is the expected size
-    if len(val_bytes) != data_len:
-        errmsg = f'Remaining msg {val_bytes.hex()} does not match expected data length {data_len}'
+    # Ensure that there are enough bytes left for the expected size
+    if end > msg_end:
+        errmsg = f'Remaining msg {bytes(data[start:msg_end]).hex()} does not match expected data length {data_len}'
         raise J1708DecodeError(errmsg)
 
-    info = pid_info.get_pid_info(pid_val)
-
-    if val_bytes == b'\xff' * data_len:
+    return (pid_val, start, end)
+
+
+def decode_from(data, offset=0, end=None, pid=None):
+    """
+    Decode the PID that starts at offset in data and return the decoded PID and
+    the offset of the next PID.  The PID data must end before end (default
+    len(data)).  The message is not copied, only the bytes for the decoded
+    value are.
+    """
+    found = find_pid(data, offset, end, pid=pid)
+    if found is None:
+        return (None, offset)
+    pid_val, start, end = found
+
+    # This is the only copy made of the message data
+    val_bytes = bytes(data[start:end])
+
+    try:
+        decoder = (_decoders or _build_decoders())[pid_val]
+    except IndexError:
+        decoder = None
+    if decoder is None:
+        # There is no information for this PID
+        raise KeyError(pid_val)
+
+    if val_bytes == b'\xff' * len(val_bytes):
         value = None
-
-    elif 'resolution' in info:
-        if isinstance(info['resolution'], Fraction) and \
-                val_bytes != b'\xff' * data_len:
-            # First byte swap the data (it's in little endian) and then multiply 
-            # by the resolution
-            if data_len == 1:
-                if info['type'].startswith('signed'):
-                    le_val = struct.unpack('<b', val_bytes)
-                else:
-                    le_val = struct.unpack('<B', val_bytes)
-            elif data_len == 2:
-                if info['type'].startswith('signed'):
-                    le_val = struct.unpack('<h', val_bytes)
-                else:
-                    le_val = struct.unpack('<H', val_bytes)
-            elif data_len == 4:
-                if info['type'].startswith('signed'):
-                    le_val = struct.unpack('<l', val_bytes)
-                else:
-                    le_val = struct.unpack('<L', val_bytes)
-            elif data_len == 8:
-                if info['type'].startswith('signed'):
-                    le_val = struct.unpack('<q', val_bytes)
-                else:
-                    le_val = struct.unpack('<Q', val_bytes)
-            else:
-                raise J1708DecodeError(f'Bad size {size} for encoding PID {pid_val} = {val_bytes.hex()} ({info})')
-
-            fractional_val = float(le_val[0] * info['resolution'])
-
-            if 'units' in info:
-                value = f'{fractional_val} {info["units"]} ({val_bytes.hex().upper()})'
-            else:
-                value = f'{fractional_val} ({val_bytes.hex().upper()})'
-
-        elif hasattr(info['type'], 'decode'):
-            value = info['type'].decode(val_bytes)
-
-        else:
-            value = val_bytes
-
     else:
-        # There is no specific encoding for this PID, so just make the value the 
-        # hex bytes
-        value = val_bytes.hex().upper()
+        value = decoder(val_bytes)
 
-    # Return a dictionary representing the PID and then the rest of the message
+    # Return a dictionary representing the PID and then the offset of the next 
+    # PID
     args = {
         'pid': pid_val,
         'value': value,
         'raw': val_bytes,
     }
-    rest = data[end:]
 
-    return (J1708PID(**args), rest)
+    return (J1708PID(**args), end)
+
+
+def decode(data, pid=None):
+    param, end = decode_from(data, pid=pid)
+    if param is None:
+        return (None, data)
+    return (param, data[end:])
+
+
+def decode_msg(msg, offset=0, end=None, lazy=False):
+    # The PIDs are decoded from the part of msg between offset and end so the 
+    # caller doesn't have to copy the message body
+    if end is None:
+        end = len(msg)
 
+    if lazy:
+        return LazyPIDs(msg, offset, end)
 
-def decode_msg(msg):
     pids = {}
-    while msg != b'':
-        param, msg = decode(msg)
+    while offset < end:
+        param, offset = decode_from(msg, offset, end)
         if param:
             pids[param.pid] = param
         else:
             # This message is invalid
-            raise J1708DecodeError(f'WARNING: unable to extract valid PID from {msg.hex()}')
+            raise J1708DecodeError(f'WARNING: unable to extract valid PID from {bytes(msg[offset:end]).hex()}')
     return pids
 
 
 def _export_pid_value(value, mid=None):
-    if hasattr(value, 'format'):
+    if hasattr(value, 'export'):
+        return value.export()
+    elif hasattr(value, 'format'):
         return value.format(mid=mid)
     elif isinstance(value, dict):
-        return dict((k, _export_pid_value(v, mid=mid)) for k, v in value.items)
-    elif isinstance(value, list):
+        return dict((k, _export_pid_value(v, mid=mid)) for k, v in value.items())
+    elif isinstance(value, (list, tuple)):
         return list(_export_pid_value(v, mid=mid) for v in value)
     elif isinstance(value, bytes) or isinstance(value, bytearray):
         # Format bytes as a string
@@ -244,7 +348,16 @@ def export(pids, mid):
 
 
 def _encode_value(pid, value, size):
-    info = pid_info.get_pid_info(pid)
+    from .pid_types import ScaledValue
+
+    info = metadata.get_pid_info(pid)
+    if isinstance(value, ScaledValue):
+        # Use the original bytes if the value was decoded from a message so 
+        # it is encoded exactly the same way
+        if value.raw is not None and (size is None or len(value.raw) == size):
+            return value.raw
+        value = value.value
+
     if isinstance(value, bytes):
         if size is not None:
             assert len(value) == size
@@ -359,9 +472,111 @@ def encode(pids):
     return msg
 
 
+class LazyPIDs(collections.abc.MutableMapping):
+    """
+    PID -> J1708PID mapping for a message that only finds where each PID is
+    when it is created, each PID is decoded the first time it is accessed.
+    Iterating over the keys, checking if a PID is present or getting the
+    number of PIDs does not decode anything.
+    """
+    def __init__(self, msg, offset=0, end=None):
+        if end is None:
+            end = len(msg)
+
+        self._msg = msg
+
+        # PID -> decoded J1708PID, or the offset of the PID in the message if 
+        # it has not been decoded yet
+        self._pids = {}
+        while offset < end:
+            found = find_pid(msg, offset, end)
+            if found is None:
+                # This message is invalid
+                raise J1708DecodeError(f'WARNING: unable to extract valid PID from {bytes(msg[offset:end]).hex()}')
+            self._pids[found[0]] = offset
+            offset = found[2]
+        self._end = end
+
+    def __repr__(self):
+        return f'{self.__class__.__name__}({self._pids!r})'
+
+    def __getitem__(self, key):
+        param = self._pids[key]
+        if isinstance(param, int):
+            param, _ = decode_from(self._msg, param, self._end)
+            self._pids[key] = param
+        return param
+
+    def __setitem__(self, key, value):
+        self._pids[key] = value
+
+    def __delitem__(self, key):
+        del self._pids[key]
+
+    def __iter__(self):
+        return iter(self._pids)
+
+    def __len__(self):
+        return len(self._pids)
+
+    def __contains__(self, key):
+        return key in self._pids
+
+    @property
+    def decoded(self):
+        """
+        The PIDs that have been decoded so far
+        """
+        return [k for k, v in self._pids.items() if not isinstance(v, int)]
+
+
+# The PIDDescriptor objects for PIDs 0-1023, indexed by PID.  Filled in as 
+# each PID is created.
+_descriptors = [None] * 1024
+
+
+class PIDDescriptor:
+    """
+    The parts of a PID that don't depend on the value: the PID number and
+    name.  Descriptors are immutable and there is only one object for each PID
+    from 0 to 1023 which is shared by every J1708PID with that PID.
+    """
+    __slots__ = ('pid', 'name')
+
+    def __new__(cls, pid):
+        if isinstance(pid, PIDDescriptor):
+            return pid
+
+        interned = type(pid) is int and 0 <= pid < len(_descriptors)
+        if interned and _descriptors[pid] is not None:
+            return _descriptors[pid]
+
+        self = super().__new__(cls)
+        object.__setattr__(self, 'pid', pid)
+        object.__setattr__(self, 'name', metadata.get_pid_name(pid))
+        if interned:
+            _descriptors[pid] = self
+        return self
+
+    def __setattr__(self, name, value):
+        raise AttributeError(f'{self.__class__.__name__} objects are immutable')
+
+    def __delattr__(self, name):
+        raise AttributeError(f'{self.__class__.__name__} objects are immutable')
+
+    def __reduce__(self):
+        # Copies and unpickled objects are the interned object
+        return (self.__class__, (self.pid,))
+
+    def __repr__(self):
+        return f'{self.__class__.__name__}({self.pid})'
+
+
 # For now this is just a data class, but eventually the functions in this file 
 # will be moved into this class
 class J1708PID:
+    __slots__ = ('pid', 'desc', 'value', 'raw', '_mid')
+
     def __init__(self, pid=None, mid=None, value=None, raw=None):
         if isinstance(pid, dict):
             item = pid
@@ -382,13 +597,18 @@ class J1708PID:
                 raw = item.raw
 
         self.pid = pid
-        self.name = pid_name.get_pid_name(pid)
+        # Shared by all PIDs with the same PID number
+        self.desc = PIDDescriptor(pid)
         self.value = value
         self.raw = raw
 
         # Used during export
         self._mid = mid
 
+    @property
+    def name(self):
+        return self.desc.name
+
     def __repr__(self):
         return f'{self.__class__.__name__}(pid={self.pid}, mid={self._mid}, value={repr(self.value)}, raw={repr(self.raw)})'
 
@@ -402,15 +622,22 @@ class J1708PID:
             'value': _export_pid_value(self.value, mid=self._mid),
             #'raw': self.raw,
         }
+        units = getattr(self.value, 'units', None)
+        if units is not None:
+            out['units'] = units
         return out
 
 
 __all__ = [
     'get_pid_value',
+    'find_pid',
+    'decode_from',
     'decode',
     'decode_msg',
     'export',
     'encode',
+    'LazyPIDs',
+    'PIDDescriptor',
     'J1708PID',
 ]
 
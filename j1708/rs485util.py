@@ -17,7 +17,7 @@ def parse_file(filename, decode=True, ignore_checksums=False, log_filename=None)
     of when a message is complete or not. This function will attempt to sort
     messages into the smallest valid messages possible.
     """
-    log = Log(decode=decode, ignore_checksums=ignore_checksums, log_filename=log_filename)
+    log = Log(decode=decode, ignore_checksum=ignore_checksums, log_filename=log_filename)
 
     with open(filename, 'rb') as f:
         data = f.read()
@@ -46,35 +46,35 @@ def parse_file(filename, decode=True, ignore_checksums=False, log_filename=None)
             raw_msg.append(data[offset])
             offset += 1
 
-            if len(raw_msg) >= 4:
+            # Technically 2 bytes is a valid message, but it seems unlikely 
+            # we will see that so to make it easier to "guess" what a valid 
+            # message is don't start checking for a valid checksum/end of 
+            # message until the message size reaches 4 bytes
+            if len(raw_msg) >= 4 and sum(raw_msg) & 0xFF == 0:
                 try:
-                    # Technically 2 bytes is a valid message, but it seems 
-                    # unlikely we will see that so to make it easier to "guess" 
-                    # what a valid message is don't start checking for a valid 
-                    # checksum/end of message until the message size reaches 
-                    # 4 bytes
-                    j1708_msg = J1708(raw_msg, decode=decode)
-                    if j1708_msg is not None and j1708_msg.is_valid():
-
-                        # Attempt to decode the message before we really 
-                        # consider it valid
-                        j1708_msg.decode()
-                        found_msgs.append(j1708_msg)
-
-                        # Record the end offset
-                        end_offset = offset
-
-                        # Prefix the message with the offset it was found at
-                        start_offset = offset - len(raw_msg)
-                        if decode:
-                            log.write(f'[{start_offset:08X}] {j1708_msg.format_for_log()}')
-                        else:
-                            log.write(f'[{start_offset:08X}] {j1708_msg}')
-
-                        # Clear the message
-                        raw_msg = bytearray()
-                        incoming = False
-                except (J1708ChecksumError, J1708DecodeError):
+                    # The checksum has just been checked so it doesn't need to 
+                    # be checked again
+                    j1708_msg = J1708.from_validated(bytes(raw_msg), None, raw_msg[-1], decode=False)
+
+                    # Attempt to decode the message before we really consider 
+                    # it valid
+                    j1708_msg.decode()
+                    found_msgs.append(j1708_msg)
+
+                    # Record the end offset
+                    end_offset = offset
+
+                    # Prefix the message with the offset it was found at
+                    start_offset = offset - len(raw_msg)
+                    if decode:
+                        log.write(f'[{start_offset:08X}] {j1708_msg.format_for_log()}')
+                    else:
+                        log.write(f'[{start_offset:08X}] {j1708_msg}')
+
+                    # Clear the message
+                    raw_msg = bytearray()
+                    incoming = False
+                except J1708DecodeError:
                     pass
 
             if len(raw_msg) >= 21:
@@ -93,4 +93,4 @@ def parse_file(filename, decode=True, ignore_checksums=False, log_filename=None)
             offset += 1
 
     if end_offset != offset:
-        log.write_print_and_loi(f'[{end_offset:08X}] SKIPPED {data[end_offset:offset].hex()}')
+        log.write(f'[{end_offset:08X}] SKIPPED {data[end_offset:offset].hex()}')
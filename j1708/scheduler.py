@@ -0,0 +1,240 @@
+import heapq
+import itertools
+import threading
+import time
+
+from . import mids as j1708_mids
+from . import pids as j1708_pids
+from .metadata import get_pid_period
+from .exceptions import *
+
+
+class BroadcastJob:
+    """
+    A PID that is periodically broadcast as a MID.  The source is either
+    a constant value or a function that returns the current value each time
+    the PID is sent.
+    """
+    def __init__(self, mid, pid, source, period=None):
+        if period is None:
+            period = get_pid_period(pid)
+            if period is None:
+                raise J1708Error(f'PID {pid} is not broadcast periodically, a period must be specified')
+        elif period <= 0:
+            raise J1708Error(f'Invalid broadcast period {period}')
+
+        self.mid = mid
+        self.pid = pid
+        self.source = source
+        self.period = period
+        self.cancelled = False
+
+        # Number of times this job was sent, and the number of periods skipped
+        # because the job could not be sent on time.
+        self.sent = 0
+        self.missed = 0
+
+        # Number of times the value could not be read or encoded, and the
+        # exception from the last failure
+        self.errors = 0
+        self.last_error = None
+
+        # The job is due at start + (count * period), calculating each due
+        # time from the start prevents small delays from accumulating.
+        self._start = None
+        self._count = 0
+
+    def __repr__(self):
+        return f'{self.__class__.__name__}(mid={self.mid}, pid={self.pid}, period={self.period})'
+
+    @property
+    def value(self):
+        if callable(self.source):
+            return self.source()
+        return self.source
+
+    def encode(self):
+        """
+        Returns the message (without a checksum) for the current value
+        """
+        pid = j1708_pids.J1708PID(pid=self.pid, value=self.value)
+        return j1708_mids.encode(self.mid) + j1708_pids.encode(pid)
+
+    def _next_due(self, now):
+        self._count += 1
+        due = self._start + (self._count * self.period)
+        if due <= now:
+            # Skip any periods that have already passed rather than sending
+            # a burst of old values
+            skipped = int((now - due) // self.period) + 1
+            self._count += skipped
+            self.missed += skipped
+            due = self._start + (self._count * self.period)
+        return due
+
+
+class BroadcastScheduler:
+    """
+    Sends periodic PID broadcasts from a background thread.  Jobs are kept in
+    a heap ordered by when they are next due (on the time.monotonic() clock),
+    all jobs that are due at the same time are sent with one
+    Iface.send_many() call:
+
+        with BroadcastScheduler(iface) as sched:
+            sched.add(37, 96, 50.0)               # Fuel level every 1.0 s
+            sched.add(128, 84, lambda: speed)     # Road speed every 0.1 s
+            time.sleep(60)
+
+    If a period is not specified the broadcast period from the PID info is
+    used.  A job whose value can't be read or encoded is skipped for that
+    period (see BroadcastJob.errors), the other jobs are still sent.  Errors
+    sending messages are counted in send_errors and don't stop the thread.
+    """
+    # Jobs that are due within this many seconds of each other are sent
+    # together
+    BATCH_WINDOW = 0.001
+
+    def __init__(self, iface, pace=True):
+        self.iface = iface
+        self._pace = pace
+
+        self._heap = []
+        self._seq = itertools.count()
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+
+        # Number of send_many() calls from the background thread that failed, 
+        # and the exception from the last failure
+        self.send_errors = 0
+        self.last_error = None
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.stop()
+
+    def __len__(self):
+        return sum(1 for _, _, job in self._heap if not job.cancelled)
+
+    @property
+    def jobs(self):
+        return [job for _, _, job in sorted(self._heap) if not job.cancelled]
+
+    def add(self, mid, pid, source, period=None, start=None):
+        """
+        Add a broadcast job, returns the new BroadcastJob.  By default the
+        first message is sent immediately, start can be used to specify
+        a different time.monotonic() value.
+        """
+        job = BroadcastJob(mid, pid, source, period=period)
+        job._start = time.monotonic() if start is None else start
+
+        with self._lock:
+            heapq.heappush(self._heap, (job._start, next(self._seq), job))
+        self._wakeup.set()
+        return job
+
+    def remove(self, job):
+        # The job is dropped from the heap when it is next due
+        job.cancelled = True
+
+    def clear(self):
+        with self._lock:
+            for _, _, job in self._heap:
+                job.cancelled = True
+            self._heap = []
+
+    def next_due(self):
+        with self._lock:
+            while self._heap and self._heap[0][2].cancelled:
+                heapq.heappop(self._heap)
+            if self._heap:
+                return self._heap[0][0]
+        return None
+
+    def run_pending(self, now=None):
+        """
+        Send all jobs that are due, returns the number of messages sent.
+        """
+        if now is None:
+            now = time.monotonic()
+
+        due_jobs = []
+        with self._lock:
+            while self._heap and self._heap[0][0] <= now + self.BATCH_WINDOW:
+                _, _, job = heapq.heappop(self._heap)
+                if not job.cancelled:
+                    due_jobs.append(job)
+
+        if not due_jobs:
+            return 0
+
+        try:
+            msgs = []
+            sent_jobs = []
+            for job in due_jobs:
+                # The value source is user code, a failure should only affect 
+                # its own job
+                try:
+                    msgs.append(job.encode())
+                except Exception as e:
+                    job.errors += 1
+                    job.last_error = e
+                else:
+                    sent_jobs.append(job)
+
+            if msgs:
+                self.iface.send_many(msgs, pace=self._pace)
+        finally:
+            # Reschedule the jobs even if sending failed so they are not lost
+            with self._lock:
+                for job in due_jobs:
+                    heapq.heappush(self._heap, (job._next_due(now), next(self._seq), job))
+
+        for job in sent_jobs:
+            job.sent += 1
+        return len(msgs)
+
+    def start(self):
+        if self._thread is None:
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        if self._thread is not None:
+            self._stop.set()
+            self._wakeup.set()
+            self._thread.join()
+            self._thread = None
+
+    def _run(self):
+        while not self._stop.is_set():
+            # Clear the wakeup event before checking the heap so a job added
+            # after the check isn't missed
+            self._wakeup.clear()
+
+            due = self.next_due()
+            now = time.monotonic()
+            if due is None:
+                self._wakeup.wait()
+            elif due > now + self.BATCH_WINDOW:
+                self._wakeup.wait(due - now)
+            else:
+                try:
+                    self.run_pending(now)
+                except (J1708Error, OSError) as e:
+                    # The jobs have been rescheduled, try again when they are 
+                    # next due
+                    self.send_errors += 1
+                    self.last_error = e
+
+
+__all__ = [
+    'BroadcastJob',
+    'BroadcastScheduler',
+]
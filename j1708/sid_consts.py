@@ -1204,15 +1204,60 @@ mid_to_sid_map = {
 }
 
 
+# SIDs are 0-255, extended SIDs are 256-511
+_NUM_SIDS = 512
+
+# SID strings for each MID, indexed by SID.  MIDs that use the same SID tables 
+# share the same list.  Built the first time a SID string is needed.
+_mid_sid_strings = None
+_default_sid_strings = None
+
+
+def _flatten_tables(tables):
+    # Some MIDs have more than one family of SIDs in a nested tuple
+    for table in tables:
+        if isinstance(table, tuple):
+            yield from _flatten_tables(table)
+        else:
+            yield table
+
+
+def _make_sid_strings(tables):
+    strings = [None] * _NUM_SIDS
+    for table in reversed(tables):
+        # Go through the tables in reverse order so the first table that has 
+        # a SID takes priority
+        for sid in range(_NUM_SIDS):
+            if sid in table:
+                strings[sid] = table[sid]
+    return strings
+
+
+def _build_sid_strings():
+    global _mid_sid_strings, _default_sid_strings
+
+    families = {}
+    mid_sid_strings = {}
+    for mid_value, tables in mid_to_sid_map.items():
+        tables = tuple(_flatten_tables(tables))
+        key = tuple(id(t) for t in tables)
+        if key not in families:
+            families[key] = _make_sid_strings(tables)
+        mid_sid_strings[mid_value] = families[key]
+
+    _default_sid_strings = _make_sid_strings((common_sids,))
+    _mid_sid_strings = mid_sid_strings
+    return mid_sid_strings
+
+
 def get_sid_string(mid, sid):
     mid_value = mids.get_mid_value(mid)
-    sid_table = mid_to_sid_map.get(mid_value, (common_sids,))
+    sid_strings = (_mid_sid_strings or _build_sid_strings()).get(mid_value, _default_sid_strings)
 
-    for table in sid_table:
-        try:
-            return table[sid]
-        except KeyError:
-            pass
+    if 0 <= sid < _NUM_SIDS:
+        sid_str = sid_strings[sid]
+        if sid_str is not None:
+            return sid_str
     return f'Unknown SID {sid} for MID {mid_value}'
 
 
@@ -0,0 +1,56 @@
+#!/usr/bin/env python3
+
+import argparse
+import time
+
+from j1708.batch import pack_frames, BatchDecoder
+from j1708.emulator import read_corpus, synthetic_msgs
+from j1708.msg import J1708
+
+
+def bench_msgs(msgs, timestamps):
+    start = time.perf_counter()
+    columns = {}
+    for msg, timestamp in zip(msgs, timestamps):
+        try:
+            j1708_msg = J1708(msg, timestamp=timestamp, msg_format='bytes')
+            pids = [(pid, j1708_msg[pid]) for pid in j1708_msg]
+        except Exception:
+            continue
+        for pid, value in pids:
+            columns.setdefault((j1708_msg.mid, pid), []).append((timestamp, value))
+    return time.perf_counter() - start
+
+
+def bench_batch(msgs, timestamps):
+    start = time.perf_counter()
+    buf, offsets = pack_frames(msgs)
+    decoder = BatchDecoder()
+    decoder.decode(buf, offsets, timestamps)
+    return time.perf_counter() - start, decoder
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--corpus', '-c',
+            help='j1708dump log or file with one hex message per line (default: synthetic messages)')
+    parser.add_argument('--count', '-n', type=int, default=100000,
+            help='number of synthetic messages (default: %(default)s)')
+    args = parser.parse_args()
+
+    if args.corpus:
+        msgs = read_corpus(args.corpus)
+    else:
+        msgs = list(synthetic_msgs(args.count, seed=0))
+    timestamps = [i * 0.01 for i in range(len(msgs))]
+
+    elapsed = bench_msgs(msgs, timestamps)
+    print(f'J1708 objects: {len(msgs)} msgs in {elapsed:.3f}s ({len(msgs) / elapsed:.0f} msgs/s)')
+
+    elapsed, decoder = bench_batch(msgs, timestamps)
+    print(f'batch        : {len(msgs)} msgs in {elapsed:.3f}s ({len(msgs) / elapsed:.0f} msgs/s), '
+          f'{decoder.checksum_errors} checksum errors, {decoder.decode_errors} decode errors')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+
+import argparse
+import random
+import string
+import timeit
+
+from j1708.msg import J1708, _is_hex
+
+
+def legacy_checksum(msg):
+    """
+    The checksum loop used before calc_checksum() used sum()
+    """
+    chksum = 0
+    for char in msg:
+        chksum = (chksum + char) & 0xFF
+
+    if chksum != 0:
+        chksum = 0x100 - chksum
+    return chksum
+
+
+def legacy_is_hex(data):
+    """
+    The hex detection used before _is_hex()
+    """
+    return all(chr(c) in string.hexdigits for c in data)
+
+
+def make_frame(rand, size):
+    body = bytes(rand.randrange(256) for _ in range(size - 1))
+    return body + bytes((J1708.calc_checksum(body),))
+
+
+def bench(stmt, count):
+    # Use the best of several runs to reduce noise
+    return min(timeit.repeat(stmt, number=count, repeat=5)) / count * 1e9
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--count', '-n', type=int, default=100000,
+            help='number of iterations per benchmark (default: %(default)s)')
+    args = parser.parse_args()
+
+    rand = random.Random(0)
+    for size in (2, 10, 21):
+        frame = make_frame(rand, size)
+        hex_frame = frame.hex().encode()
+
+        for a, b in ((legacy_checksum(frame[:-1]), J1708.calc_checksum(frame[:-1])),
+                     (legacy_is_hex(frame), _is_hex(frame)),
+                     (legacy_is_hex(hex_frame), _is_hex(hex_frame))):
+            if a != b:
+                print(f'WARNING: results for {size} byte frame do not match')
+
+        results = (
+            ('checksum, legacy', bench(lambda: legacy_checksum(frame), args.count)),
+            ('checksum', bench(lambda: J1708.calc_checksum(frame), args.count)),
+            ('hex detect, legacy', bench(lambda: legacy_is_hex(hex_frame), args.count)),
+            ('hex detect', bench(lambda: _is_hex(hex_frame), args.count)),
+            ('J1708 hex, detected', bench(lambda: J1708(hex_frame, decode=False), args.count)),
+            ('J1708 hex, declared', bench(lambda: J1708(hex_frame, decode=False, msg_format='hex'), args.count)),
+            ('J1708 bytes, detected', bench(lambda: J1708(frame, decode=False), args.count)),
+            ('J1708 bytes, declared', bench(lambda: J1708(frame, decode=False, msg_format='bytes'), args.count)),
+            ('J1708.from_validated', bench(lambda: J1708.from_validated(frame, 0.0, frame[-1], decode=False), args.count)),
+        )
+
+        print(f'{size} byte frame:')
+        for name, ns in results:
+            print(f'  {name:22}: {ns:.0f} ns')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+
+import argparse
+import time
+
+from j1708.emulator import read_corpus, synthetic_msgs
+from j1708.iface import HexFramer, BinaryFramer
+from j1708.msg import J1708
+from j1708.utils import LRUCache
+
+
+def bench(frames, msg_format, decode=True, lazy=False, pid=None, cache_size=None, repeat=3):
+    # Use the best of several runs to reduce noise
+    best = None
+    for _ in range(repeat):
+        # Start each run with an empty cache
+        cache = LRUCache(cache_size) if cache_size else None
+
+        start = time.perf_counter()
+        for frame in frames:
+            msg = J1708(frame, decode=decode, msg_format=msg_format, lazy=lazy, cache=cache)
+            # Simulate a filter that only looks at one PID
+            if pid is not None and pid in msg:
+                msg[pid]
+        elapsed = time.perf_counter() - start
+        if best is None or elapsed < best:
+            best = elapsed
+    return best
+
+
+def bench_framing(framer, msgs, chunk_size=4096, repeat=3):
+    stream = b''.join(framer.encode(m[:-1]) for m in msgs)
+    chunks = [stream[i:i + chunk_size] for i in range(0, len(stream), chunk_size)]
+
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for chunk in chunks:
+            framer.feed(chunk)
+        elapsed = time.perf_counter() - start
+        if best is None or elapsed < best:
+            best = elapsed
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--corpus', '-c',
+            help='j1708dump log or file with one hex message per line (default: synthetic messages)')
+    parser.add_argument('--count', '-n', type=int, default=100000,
+            help='number of synthetic messages (default: %(default)s)')
+    parser.add_argument('--pid', '-p', type=int, default=84,
+            help='PID to read in the filtered benchmarks (default: %(default)s)')
+    parser.add_argument('--cache-size', type=int, default=1024,
+            help='decode cache size for the cached benchmark (default: %(default)s)')
+    args = parser.parse_args()
+
+    if args.corpus:
+        msgs = read_corpus(args.corpus)
+    else:
+        msgs = list(synthetic_msgs(args.count, seed=0))
+
+    hex_frames = [m.hex().encode() for m in msgs]
+
+    for name, framer in (('hex framing', HexFramer()), ('binary framing', BinaryFramer())):
+        elapsed = bench_framing(framer, msgs)
+        print(f'{name:22}: {len(msgs)} msgs in {elapsed:.3f}s ({len(msgs) / elapsed:.0f} msgs/s)')
+
+    for name, frames, msg_format, decode, lazy, pid in (
+            ('hex frames, no decode', hex_frames, 'hex', False, False, None),
+            ('hex frames', hex_frames, 'hex', True, False, None),
+            ('binary frames', msgs, 'bytes', True, False, None),
+            ('binary frames, lazy', msgs, 'bytes', True, True, None),
+            ('filtered', msgs, 'bytes', True, False, args.pid),
+            ('filtered, lazy', msgs, 'bytes', True, True, args.pid)):
+        elapsed = bench(frames, msg_format, decode=decode, lazy=lazy, pid=pid)
+        print(f'{name:22}: {len(frames)} msgs in {elapsed:.3f}s ({len(frames) / elapsed:.0f} msgs/s)')
+
+    # Synthetic messages are random so the hit rate is low, use --corpus with 
+    # a capture of real traffic to see the effect of the cache
+    for name, frames, msg_format in (
+            ('hex frames, cached', hex_frames, 'hex'),
+            ('binary frames, cached', msgs, 'bytes')):
+        elapsed = bench(frames, msg_format, cache_size=args.cache_size)
+        print(f'{name:22}: {len(frames)} msgs in {elapsed:.3f}s ({len(frames) / elapsed:.0f} msgs/s)')
+
+
+if __name__ == '__main__':
+    main()
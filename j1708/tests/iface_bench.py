@@ -0,0 +1,60 @@
+#!/usr/bin/env python3
+
+import argparse
+import os
+import time
+
+from j1708.emulator import Emulator, synthetic_msgs
+from j1708.iface import Iface
+from j1708.log import Log
+
+
+def bench(msgs, speedup, binary=False, ring_size=None, decode=False):
+    with Emulator() as emu:
+        iface = Iface(emu.port, binary=binary, ring_size=ring_size)
+        if ring_size:
+            iface.start_reader()
+        log = Log(decode=decode, log_filename=os.devnull, stdout=False, msg_format=iface.msg_format)
+
+        emu.start_playback(msgs, speedup=speedup)
+        start = time.perf_counter()
+        received = 0
+        while True:
+            msg = iface.readmsg(timeout=0.5)
+            if msg is None:
+                break
+            log.logmsg(msg)
+            received += 1
+
+        # Don't count the final timeout
+        elapsed = time.perf_counter() - start - 0.5
+        stats = iface.stats
+        emu.wait_playback()
+        iface.close()
+
+    dropped = stats['dropped'] if stats else 0
+    return received, dropped, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--count', '-c', type=int, default=20000)
+    parser.add_argument('--speedup', '-s', type=float, default=10.0,
+            help='multiple of the real J1708 bus speed, 0 is as fast as possible')
+    args = parser.parse_args()
+
+    msgs = list(synthetic_msgs(args.count, seed=0))
+    speedup = args.speedup or None
+
+    for binary in (False, True):
+        for ring_size in (None, 1024):
+            for decode in (False, True):
+                received, dropped, elapsed = bench(msgs, speedup, binary=binary, ring_size=ring_size, decode=decode)
+                mode = 'binary' if binary else 'hex'
+                reader = f'ring {ring_size}' if ring_size else 'direct'
+                print(f'{mode:6} {reader:9} decode={decode!s:5}: {received}/{len(msgs)} msgs '
+                      f'in {elapsed:.3f}s ({received / elapsed:.0f} msgs/s, {dropped} dropped)')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+
+
+# Each test is run in a new interpreter so nothing is already imported
+_TEST_SCRIPT = '''
+import json
+import sys
+import time
+
+start = time.perf_counter()
+import j1708
+imported = time.perf_counter()
+msg = j1708.J1708(bytes.fromhex('{msg}'))
+str(msg)
+decoded = time.perf_counter()
+
+tables = [m for m in ('j1708.pid_info', 'j1708.pid_types', 'j1708.sid_consts', 'asyncio')
+          if m in sys.modules]
+print(json.dumps({{
+    'import': imported - start,
+    'decode': decoded - imported,
+    'tables': tables,
+}}))
+'''
+
+
+def run_once(msg, lazy):
+    script = _TEST_SCRIPT.format(msg=msg)
+    if not lazy:
+        # Import the table modules up front the way the package used to
+        script = script.replace('import j1708\n', 'import j1708\nimport j1708.pid_types, j1708.sid_consts, asyncio\n', 1)
+    output = subprocess.check_output([sys.executable, '-c', script])
+    return json.loads(output)
+
+
+def report(name, results):
+    imports = [r['import'] * 1000 for r in results]
+    decodes = [r['decode'] * 1000 for r in results]
+    print(f'{name:6}: import {statistics.median(imports):.1f} ms, '
+          f'first decode {statistics.median(decodes):.1f} ms, '
+          f'total {statistics.median(i + d for i, d in zip(imports, decodes)):.1f} ms')
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--count', '-n', type=int, default=10,
+            help='number of times to run each test (default: %(default)s)')
+    parser.add_argument('--msg', '-m', default='8054005c00d0',
+            help='hex message to decode (default: %(default)s)')
+    args = parser.parse_args()
+
+    lazy = [run_once(args.msg, True) for _ in range(args.count)]
+    eager = [run_once(args.msg, False) for _ in range(args.count)]
+
+    report('eager', eager)
+    report('lazy', lazy)
+
+    # Check what "import j1708" loads on its own
+    script = 'import sys, j1708; print(",".join(m for m in ("j1708.pid_info", "j1708.pid_types", "j1708.sid_consts", "asyncio") if m in sys.modules))'
+    loaded = subprocess.check_output([sys.executable, '-c', script]).decode().strip()
+    print(f'modules loaded by "import j1708": {loaded or "none"}')
+    print(f'modules loaded after first decode: {", ".join(lazy[0]["tables"]) or "none"}')
+
+
+if __name__ == '__main__':
+    main()
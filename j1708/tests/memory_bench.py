@@ -0,0 +1,59 @@
+#!/usr/bin/env python3
+
+import argparse
+import gc
+import tracemalloc
+
+from j1708.emulator import read_corpus, synthetic_msgs
+from j1708.msg import J1708
+
+
+def measure(frames, msg_format, decode=True, lazy=False):
+    """
+    Returns the number of bytes allocated for each message that is kept
+    """
+    # Decode one message first so the PID tables are not included
+    J1708(frames[0], msg_format=msg_format, decode=decode, lazy=lazy).format_for_log()
+
+    gc.collect()
+    tracemalloc.start()
+    before, _ = tracemalloc.get_traced_memory()
+
+    msgs = [J1708(f, msg_format=msg_format, decode=decode, lazy=lazy) for f in frames]
+
+    gc.collect()
+    after, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    # The list holding the messages is not part of the message size
+    per_msg = (after - before) / len(msgs) - 8
+    del msgs
+    return per_msg
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--corpus', '-c',
+            help='j1708dump log or file with one hex message per line (default: synthetic messages)')
+    parser.add_argument('--count', '-n', type=int, default=100000,
+            help='number of synthetic messages (default: %(default)s)')
+    args = parser.parse_args()
+
+    if args.corpus:
+        msgs = read_corpus(args.corpus)
+    else:
+        msgs = list(synthetic_msgs(args.count, seed=0))
+
+    hex_frames = [m.hex().encode() for m in msgs]
+
+    for name, frames, msg_format, decode, lazy in (
+            ('binary, no decode', msgs, 'bytes', False, False),
+            ('binary', msgs, 'bytes', True, False),
+            ('binary, lazy', msgs, 'bytes', True, True),
+            ('hex', hex_frames, 'hex', True, False)):
+        per_msg = measure(frames, msg_format, decode=decode, lazy=lazy)
+        print(f'{name:18}: {per_msg:.0f} bytes per retained message ({len(frames)} msgs)')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+
+from j1708 import metadata
+
+
+# Each test is run in a new interpreter so nothing is already loaded
+_TEST_SCRIPT = '''
+import json
+import resource
+import sys
+import time
+import tracemalloc
+
+tracemalloc.start()
+start = time.perf_counter()
+
+import j1708
+from j1708 import metadata
+if not {packed}:
+    metadata._packed = False
+
+msgs = [j1708.J1708(bytes.fromhex(m)) for m in {msgs!r}]
+for msg in msgs:
+    msg.format_for_log()
+
+elapsed = time.perf_counter() - start
+current, peak = tracemalloc.get_traced_memory()
+print(json.dumps({{
+    'packed': bool(metadata._packed),
+    'time': elapsed,
+    'allocated': current,
+    'maxrss': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+}}))
+'''
+
+# Engine speed and a DTC, so the PID info, PID name and SID tables are used
+_MSGS = ['8054005c00d0', '80c2020510a7']
+
+
+def run_once(packed):
+    script = _TEST_SCRIPT.format(packed=packed, msgs=_MSGS)
+    output = subprocess.check_output([sys.executable, '-c', script])
+    return json.loads(output)
+
+
+def report(name, results):
+    print(f'{name:8}: import and decode {statistics.median(r["time"] for r in results) * 1000:.1f} ms, '
+          f'allocated {statistics.median(r["allocated"] for r in results) / 1024:.0f} KiB, '
+          f'max RSS {statistics.median(r["maxrss"] for r in results):.0f} KiB')
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--count', '-n', type=int, default=5,
+            help='number of times to run each test (default: %(default)s)')
+    args = parser.parse_args()
+
+    if metadata.load() is None:
+        print('metadata.bin is missing or out of date, build it with "make metadata"')
+        sys.exit(1)
+
+    tables = [run_once(False) for _ in range(args.count)]
+    packed = [run_once(True) for _ in range(args.count)]
+    if not all(r['packed'] for r in packed):
+        print('WARNING: the packed metadata was not used')
+
+    report('tables', tables)
+    report('packed', packed)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+
+import argparse
+import struct
+import time
+from fractions import Fraction
+
+from j1708 import pids
+from j1708.emulator import read_corpus, synthetic_msgs
+from j1708.pid_info import get_pid_info
+from j1708.pid_types import ScaledValue
+
+
+def legacy_decode_value(pid_val, val_bytes):
+    """
+    The PID value decoding done by pids.decode() before the decoder table
+    was added, used as the reference for the benchmark.
+    """
+    data_len = len(val_bytes)
+    info = get_pid_info(pid_val)
+
+    if val_bytes == b'\xff' * data_len:
+        return None
+
+    if isinstance(info['resolution'], Fraction):
+        if data_len == 1:
+            fmt = '<b' if info['type'].startswith('signed') else '<B'
+        elif data_len == 2:
+            fmt = '<h' if info['type'].startswith('signed') else '<H'
+        elif data_len == 4:
+            fmt = '<l' if info['type'].startswith('signed') else '<L'
+        else:
+            fmt = '<q' if info['type'].startswith('signed') else '<Q'
+        le_val = struct.unpack(fmt, val_bytes)
+        fractional_val = float(le_val[0] * info['resolution'])
+        if 'units' in info:
+            return f'{fractional_val} {info["units"]} ({val_bytes.hex().upper()})'
+        return f'{fractional_val} ({val_bytes.hex().upper()})'
+
+    elif hasattr(info.get('type'), 'decode'):
+        return info['type'].decode(val_bytes)
+
+    return val_bytes
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--corpus', '-c',
+            help='j1708dump log or file with one hex message per line (default: synthetic messages)')
+    parser.add_argument('--count', '-n', type=int, default=100000,
+            help='number of synthetic messages (default: %(default)s)')
+    args = parser.parse_args()
+
+    if args.corpus:
+        msgs = read_corpus(args.corpus)
+    else:
+        msgs = list(synthetic_msgs(args.count, seed=0))
+
+    # Extract the PID values to decode from the messages
+    values = []
+    for msg in msgs:
+        offset = 1
+        while offset < len(msg) - 1:
+            param, offset = pids.decode_from(msg, offset, len(msg) - 1)
+            values.append((param.pid, param.raw))
+
+    legacy = [legacy_decode_value(p, v) for p, v in values]
+    # Scaled values are compared by the text they are displayed as
+    table = [pids.decode_from(v, pid=p)[0].value for p, v in values]
+    table = [str(v) if isinstance(v, ScaledValue) else v for v in table]
+    if legacy != table:
+        print('WARNING: decoded values do not match')
+
+    for name, func in (('legacy', legacy_decode_value), ('decoder table', None)):
+        start = time.perf_counter()
+        if func is None:
+            decoders = pids._decoders
+            for pid, val_bytes in values:
+                if val_bytes != b'\xff' * len(val_bytes):
+                    decoders[pid](val_bytes)
+        else:
+            for pid, val_bytes in values:
+                func(pid, val_bytes)
+        elapsed = time.perf_counter() - start
+        print(f'{name:14}: {len(values)} values in {elapsed:.3f}s ({len(values) / elapsed:.0f} values/s)')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+
+import argparse
+import random
+import time
+
+from j1708 import mids, pid_name, sid_consts
+
+
+def legacy_lookup(table, match_key):
+    """
+    The linear search done by RangeDict before the lookup index was added,
+    used as the reference for the benchmark.
+    """
+    for key, value in table.items():
+        if isinstance(key, range):
+            if match_key in key:
+                return value
+        elif match_key == key:
+            return value
+    raise KeyError(match_key)
+
+
+def bench(func, table, keys):
+    start = time.perf_counter()
+    for key in keys:
+        try:
+            func(table, key)
+        except KeyError:
+            pass
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--count', '-n', type=int, default=100000,
+            help='number of lookups per table (default: %(default)s)')
+    args = parser.parse_args()
+
+    rand = random.Random(0)
+    tables = (
+        ('MID names', mids.msgs, 256),
+        ('PID names', pid_name._pids, 1024),
+        ('engine SIDs', sid_consts.engine_sids, 256),
+    )
+
+    for name, table, key_range in tables:
+        keys = [rand.randrange(key_range) for _ in range(args.count)]
+
+        for key in range(key_range):
+            if table.get_key(key) is not None and table[key] != legacy_lookup(table, key):
+                print(f'WARNING: {name} lookups do not match')
+                break
+
+        legacy = bench(legacy_lookup, table, keys)
+        indexed = bench(type(table).__getitem__, table, keys)
+        print(f'{name:12}: legacy {args.count / legacy:.0f} lookups/s, indexed {args.count / indexed:.0f} lookups/s')
+
+
+if __name__ == '__main__':
+    main()
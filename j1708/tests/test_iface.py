@@ -0,0 +1,264 @@
+import asyncio
+import sys
+import time
+
+import pytest
+
+from j1708.emulator import Emulator
+from j1708.iface import Iface, AsyncIface, HexFramer, BinaryFramer, HOST_CMD_BINARY, HOST_CMD_HEX
+from j1708.msg import J1708
+
+
+pytestmark = pytest.mark.skipif(sys.platform == 'win32', reason='the emulator needs a pty')
+
+# Engine road speed and percent load, and the instrument cluster fuel level
+# (without a checksum) used by tx_test.py
+RX_MSG = bytes.fromhex('8054005c00d0')
+TX_MSG = bytes.fromhex('256064')
+TX_FRAME = TX_MSG + bytes((J1708.calc_checksum(TX_MSG),))
+
+
+class OldFirmware(Emulator):
+    """
+    Firmware from before the host protocol commands were added, commands are
+    ignored
+    """
+    def _feed(self, data):
+        msgs = self._frame_msgs(self._framer.feed(data))
+        while self._framer.control is not None:
+            msgs += self._frame_msgs(self._framer.feed(self._framer.take()))
+        return msgs
+
+
+@pytest.fixture
+def emu():
+    with Emulator() as emu:
+        yield emu
+
+
+def wait_for(cond, timeout=1.0):
+    end = time.monotonic() + timeout
+    while not cond():
+        if time.monotonic() > end:
+            return False
+        time.sleep(0.01)
+    return True
+
+
+async def async_wait_for(cond, timeout=1.0):
+    end = time.monotonic() + timeout
+    while not cond():
+        if time.monotonic() > end:
+            return False
+        await asyncio.sleep(0.01)
+    return True
+
+
+def frame_bytes(dev, frame):
+    if dev.msg_format == 'hex':
+        return bytes.fromhex(frame.decode())
+    return frame
+
+
+@pytest.mark.parametrize('binary', [False, True])
+def test_read(emu, binary):
+    dev = Iface(emu.port, timeout=1.0, binary=binary)
+    assert dev.binary == binary
+    assert emu.binary == binary
+
+    emu.inject(RX_MSG)
+    assert frame_bytes(dev, dev.readmsg()) == RX_MSG
+    dev.close()
+
+
+@pytest.mark.parametrize('binary', [False, True])
+def test_send_echo(emu, binary):
+    dev = Iface(emu.port, timeout=1.0, binary=binary)
+
+    dev.send(TX_MSG)
+    assert wait_for(lambda: emu.transmitted)
+    assert emu.transmitted == [TX_FRAME]
+
+    # Like the bus, the emulator echoes transmitted messages back
+    assert frame_bytes(dev, dev.readmsg()) == TX_FRAME
+    dev.close()
+
+
+def test_no_echo():
+    with Emulator(echo=False) as emu:
+        dev = Iface(emu.port, timeout=0.2)
+        dev.send(TX_MSG)
+        assert wait_for(lambda: emu.transmitted)
+        assert dev.readmsg() is None
+        dev.close()
+
+
+@pytest.mark.parametrize('binary', [False, True])
+def test_device_timestamps(emu, binary):
+    dev = Iface(emu.port, timeout=1.0, binary=binary, device_timestamps=True)
+    assert dev.device_timestamps
+    assert emu.timestamps
+
+    emu.inject(RX_MSG)
+    frame, timestamp = dev.readmsg_timed()
+    assert frame_bytes(dev, frame) == RX_MSG
+    assert abs(timestamp - time.time()) < 1.0
+    dev.close()
+
+
+def test_modes_reset_between_sessions(emu):
+    dev = Iface(emu.port, timeout=1.0, binary=True, device_timestamps=True)
+    dev.close()
+
+    # Closing the port doesn't wait for the commands to be acknowledged
+    assert wait_for(lambda: not emu.binary and not emu.timestamps)
+
+    dev = Iface(emu.port, timeout=1.0)
+    emu.inject(RX_MSG)
+    assert J1708(dev.readmsg()).is_valid()
+    dev.close()
+
+
+def test_modes_left_enabled(emu):
+    # A program that exits without closing the port leaves the tool in
+    # whatever mode it was using
+    dev = Iface(emu.port, timeout=1.0, binary=True, device_timestamps=True)
+    dev.serial.close()
+    dev.serial = None
+
+    dev = Iface(emu.port, timeout=1.0)
+    assert not emu.binary
+    assert not emu.timestamps
+    emu.inject(RX_MSG)
+    assert J1708(dev.readmsg()).is_valid()
+    dev.close()
+
+
+def test_set_binary(emu):
+    dev = Iface(emu.port, timeout=1.0)
+    assert not dev.binary
+
+    for binary in (True, False, True):
+        assert dev.set_binary(binary)
+        assert dev.binary == binary
+        assert emu.binary == binary
+        assert dev.msg_format == ('bytes' if binary else 'hex')
+
+        emu.inject(RX_MSG)
+        assert frame_bytes(dev, dev.readmsg()) == RX_MSG
+
+    dev.close()
+    assert wait_for(lambda: not emu.binary)
+
+
+def test_set_binary_keeps_pending_msgs(emu):
+    dev = Iface(emu.port, timeout=1.0)
+
+    # Messages received while waiting for the acknowledgement are returned
+    # afterwards in the format they were received in
+    emu.inject(RX_MSG)
+    assert dev.set_binary(True)
+    assert dev.readmsg() == RX_MSG.hex().encode()
+    dev.close()
+
+
+def test_mode_switch_mid_stream(emu):
+    emu.echo = False
+    dev = Iface(emu.port, timeout=1.0)
+
+    # A message, the binary mode command and a message in binary mode all in
+    # one write, each message has to be framed in the mode it was sent in
+    other = RX_MSG
+    data = HexFramer().encode_frame(TX_FRAME) + HexFramer().encode_control(HOST_CMD_BINARY) + \
+            BinaryFramer().encode_frame(other)
+    dev.serial.write(data)
+    assert wait_for(lambda: len(emu.transmitted) == 2)
+    assert emu.transmitted == [TX_FRAME, other]
+    assert emu.binary
+
+    # The acknowledgement switches the host to binary mode as well
+    assert dev.readmsg() is None
+    assert dev.binary
+
+    dev.serial.write(BinaryFramer().encode_control(HOST_CMD_HEX) + HexFramer().encode_frame(TX_FRAME))
+    assert wait_for(lambda: len(emu.transmitted) == 3)
+    assert emu.transmitted[2] == TX_FRAME
+    assert not emu.binary
+    dev.close()
+
+
+def test_oversized_binary_frame(emu):
+    emu.echo = False
+    dev = Iface(emu.port, timeout=1.0, binary=True)
+
+    # Like the firmware, a frame longer than a J1708 message is discarded
+    # even if its length byte is correct
+    too_long = bytes(range(24)) + bytes((J1708.calc_checksum(bytes(range(24))),))
+    dev.serial.write(BinaryFramer().encode_frame(too_long))
+    dev.send(TX_MSG)
+    assert wait_for(lambda: emu.transmitted)
+    assert emu.transmitted == [TX_FRAME]
+    dev.close()
+
+
+def test_old_firmware(monkeypatch):
+    monkeypatch.setattr(Iface, 'CMD_TIMEOUT', 0.1)
+    with OldFirmware() as emu:
+        dev = Iface(emu.port, timeout=1.0, binary=True, device_timestamps=True)
+        assert not dev.binary
+        assert not dev.device_timestamps
+
+        emu.inject(RX_MSG)
+        assert dev.readmsg() == RX_MSG.hex().encode()
+        dev.send(TX_MSG)
+        assert frame_bytes(dev, dev.readmsg()) == TX_FRAME
+        dev.close()
+
+
+def test_async_receive(emu):
+    async def receive():
+        async with AsyncIface(emu.port) as dev:
+            emu.inject(RX_MSG)
+            emu.inject(TX_FRAME)
+
+            msgs = []
+            async for msg in dev:
+                msgs.append(msg)
+                if len(msgs) == 2:
+                    break
+            return msgs
+
+    msgs = asyncio.run(asyncio.wait_for(receive(), 2.0))
+    assert [m.msg for m in msgs] == [RX_MSG, TX_FRAME]
+    assert msgs[0].pids[0].pid == 84
+
+
+def test_async_send_echo(emu):
+    async def send():
+        async with AsyncIface(emu.port) as dev:
+            await dev.send(TX_MSG)
+            assert await async_wait_for(lambda: emu.transmitted)
+            return await dev.__anext__()
+
+    echo = asyncio.run(asyncio.wait_for(send(), 2.0))
+    assert emu.transmitted == [TX_FRAME]
+    assert echo.msg == TX_FRAME
+
+
+def test_async_modes_reset(emu):
+    # Leave the tool in binary mode with timestamps enabled
+    dev = Iface(emu.port, timeout=1.0, binary=True, device_timestamps=True)
+    dev.serial.close()
+    dev.serial = None
+
+    async def receive():
+        async with AsyncIface(emu.port) as dev:
+            # The reset commands are not acknowledged to the caller
+            assert await async_wait_for(lambda: not emu.binary and not emu.timestamps)
+            emu.inject(RX_MSG)
+            msg = await dev.__anext__()
+            return msg, dev.checksum_errors
+
+    msg, checksum_errors = asyncio.run(asyncio.wait_for(receive(), 2.0))
+    assert msg.msg == RX_MSG
+    assert checksum_errors == 0
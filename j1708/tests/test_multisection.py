@@ -0,0 +1,135 @@
+import pytest
+
+from j1708.log import Log
+from j1708.msg import J1708
+from j1708.multisection import MultisectionReassembler
+
+
+VIN = b'1HGCM82633A004352'
+
+
+def sections(pid, data, mid=128, chunk=6, start=0.0, step=0.1):
+    """
+    Split data into PID 192 sections of the parameter pid, returns the
+    decoded messages
+    """
+    parts = [data[i:i + chunk] for i in range(0, len(data), chunk)] or [b'']
+    last = len(parts) - 1
+
+    msgs = []
+    for cur, part in enumerate(parts):
+        body = bytes((pid, (last << 4) | cur))
+        if cur == 0:
+            body += bytes((len(data),))
+        body += part
+
+        msg = bytes((mid, 192, len(body))) + body
+        msg += bytes((J1708.calc_checksum(msg),))
+        msgs.append(J1708(msg, timestamp=start + (cur * step)))
+    return msgs
+
+
+def feed_all(reassembler, msgs):
+    merged = []
+    for msg in msgs:
+        merged += reassembler.feed(msg)
+    return merged
+
+
+def test_in_order():
+    r = MultisectionReassembler()
+    merged = feed_all(r, sections(237, VIN))
+
+    assert len(merged) == 1
+    assert merged[0].is_valid()
+    assert merged[0].pids[0].pid == 237
+    assert merged[0].time == pytest.approx(0.2)
+    assert r.completed == 1
+    assert len(r) == 0
+    assert r.size == 0
+
+
+def test_out_of_order_and_duplicates():
+    r = MultisectionReassembler()
+    msgs = sections(237, VIN)
+    other = J1708(bytes.fromhex('8054005c00d0'), timestamp=0.0)
+
+    stream = [msgs[2], other, msgs[0], msgs[0], msgs[1]]
+    out = list(r.reassemble(stream))
+
+    # Every message is passed through, followed by the merged message
+    assert out[:-1] == stream
+    assert out[-1].pids[0].pid == 237
+    assert r.stats()['completed'] == 1
+    assert r.errors == 0
+
+
+def test_sources_are_separate():
+    r = MultisectionReassembler()
+    first, second, third = sections(237, VIN)
+
+    assert r.feed(first, source='a') == []
+    assert r.feed(second, source='b') == []
+    assert r.feed(third, source='a') == []
+    assert len(r) == 2
+
+
+def test_expire():
+    r = MultisectionReassembler(timeout=1.0)
+    msgs = sections(237, VIN, step=2.0)
+
+    assert feed_all(r, msgs) == []
+    assert r.expired == 2
+    assert r.completed == 0
+    assert len(r) == 1
+
+
+def test_max_bytes():
+    r = MultisectionReassembler(max_bytes=40)
+    a = sections(237, VIN, mid=128)
+    b = sections(237, VIN, mid=136)
+    c = sections(237, VIN, mid=140)
+
+    merged = feed_all(r, [a[0], b[0], c[0], a[1], a[2]])
+    assert len(merged) == 1
+    assert r.dropped == 1
+    assert r.size <= 40
+
+
+def test_restarted_transfer():
+    r = MultisectionReassembler()
+    old = sections(237, VIN)
+    new = sections(237, b'2' + VIN[1:])
+
+    merged = feed_all(r, [old[0]] + new)
+    assert r.dropped == 1
+    assert len(merged) == 1
+    assert merged[0].pids[0].value.startswith(b'2')
+
+
+# Merged data that the PID type decoders can't handle: a DTC that is cut
+# short and a multisection parameter that is too short
+@pytest.mark.parametrize('pid, data', [(194, b'\x05'), (192, b'\x01\x02')])
+def test_malformed_payload(pid, data):
+    r = MultisectionReassembler()
+    assert feed_all(r, sections(pid, data)) == []
+    assert r.errors == 1
+    assert r.completed == 0
+    assert len(r) == 0
+
+
+def test_log_malformed_payload(capsys):
+    log = Log(multisection=MultisectionReassembler())
+    for msg in sections(194, b'\x05'):
+        log.logmsg(msg)
+    assert 'SECTION pid 194' in capsys.readouterr().out
+
+
+def test_merged_msgs_are_not_sections():
+    # The merged data is itself a PID 192 section
+    inner = bytes((237, 0x00, 3)) + b'ABC'
+    r = MultisectionReassembler()
+    merged = feed_all(r, sections(192, inner))
+    assert len(merged) == 1
+    assert r.feed(merged[0]) == []
+    assert len(r) == 0
@@ -1 +1,3 @@
 from .rangedict import *
+from .ring import *
+from .lru import *
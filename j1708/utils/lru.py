@@ -0,0 +1,76 @@
+import collections
+import threading
+
+
+class LRUCache:
+    """
+    Thread safe fixed size mapping that discards the least recently used item
+    when it is full.
+
+    Counters:
+        hits:       number of lookups that found an item
+        misses:     number of lookups that did not find an item
+        evictions:  number of items discarded because the cache was full
+    """
+    def __init__(self, maxsize=1024):
+        if maxsize < 1:
+            raise ValueError(f'Invalid cache size {maxsize}')
+
+        self.maxsize = maxsize
+
+        self._items = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self):
+        return len(self._items)
+
+    def __contains__(self, key):
+        return key in self._items
+
+    def get(self, key, default=None):
+        """
+        Return the item for key and mark it as the most recently used, or
+        default if the key is not in the cache.
+        """
+        with self._lock:
+            try:
+                item = self._items[key]
+            except KeyError:
+                self.misses += 1
+                return default
+
+            self._items.move_to_end(key)
+            self.hits += 1
+            return item
+
+    def put(self, key, item):
+        with self._lock:
+            self._items[key] = item
+            self._items.move_to_end(key)
+            if len(self._items) > self.maxsize:
+                self._items.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'size': len(self._items),
+            'maxsize': self.maxsize,
+            'hit_rate': self.hits / lookups if lookups else 0.0,
+        }
+
+
+__all__ = [
+    'LRUCache',
+]
@@ -1,80 +1,192 @@
+import bisect
+
+
+class _RangeIndex:
+    """
+    Lookup index for the integer and range keys of a RangeDict.  The keys are
+    split into non-overlapping segments, each segment belongs to the first key
+    (in insertion order) that covers it.  Small key spaces are also expanded
+    into a list that can be indexed directly.
+    """
+    def __init__(self, items, dense_limit):
+        self.length = 0
+        self.min = None
+        self.max = None
+
+        # Keys that are not integers or ranges with a step of 1 can only be 
+        # found with a linear search
+        self.complete = True
+
+        spans = []
+        for key, value in items:
+            if isinstance(key, range):
+                self.length += len(key)
+                min_val, max_val = key.start, key.stop - 1
+                if key.step != 1:
+                    self.complete = False
+                elif key:
+                    spans.append((key.start, key.stop, key, value))
+            elif type(key) is int:
+                self.length += 1
+                min_val, max_val = key, key
+                spans.append((key, key + 1, key, value))
+            else:
+                self.length += 1
+                self.complete = False
+                continue
+
+            if self.min is None or min_val < self.min:
+                self.min = min_val
+            if self.max is None or max_val > self.max:
+                self.max = max_val
+
+        bounds = sorted(set(b for s in spans for b in s[:2]))
+        owners = [None] * len(bounds)
+        for start, stop, key, value in spans:
+            # Only segments that don't already belong to an earlier key are 
+            # assigned to this key
+            first = bisect.bisect_left(bounds, start)
+            last = bisect.bisect_left(bounds, stop)
+            for i in range(first, last):
+                if owners[i] is None:
+                    owners[i] = (key, value)
+
+        self.bounds = bounds
+        self.owners = owners
+
+        # Expand the segments into a list for small non-negative key spaces
+        self.dense = None
+        if spans and self.complete and self.min >= 0 and self.max < dense_limit:
+            dense = [None] * (self.max + 1)
+            for i in range(len(bounds) - 1):
+                if owners[i] is not None:
+                    dense[bounds[i]:bounds[i + 1]] = [owners[i]] * (bounds[i + 1] - bounds[i])
+            self.dense = dense
+
+    def find(self, match_key):
+        """
+        Returns the (key, value) that contains match_key, or None
+        """
+        if self.dense is not None:
+            if 0 <= match_key < len(self.dense):
+                return self.dense[match_key]
+            return None
+
+        i = bisect.bisect_right(self.bounds, match_key) - 1
+        if 0 <= i < len(self.owners) - 1:
+            return self.owners[i]
+        return None
+
 
 class RangeDict(dict):
+    # Integer key spaces smaller than this are looked up with a list instead 
+    # of a binary search
+    DENSE_LIMIT = 4096
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._index = None
+
+    def _get_index(self):
+        # The index is built the first time it is needed and discarded 
+        # whenever the dict is modified
+        index = self.__dict__.get('_index')
+        if index is None:
+            index = _RangeIndex(self.items(), self.DENSE_LIMIT)
+            self._index = index
+        return index
+
+    def _find(self, match_key, build=True):
+        # If build is False the index is only used if it already exists
+        if build:
+            index = self._get_index()
+        else:
+            index = self.__dict__.get('_index')
+        if index is not None and index.complete and type(match_key) is int:
+            return index.find(match_key)
+
+        for key, value in self.items():
+            if isinstance(key, range):
+                if match_key in key:
+                    return (key, value)
+            elif match_key == key:
+                return (key, value)
+        return None
+
     def __setitem__(self, key, value):
         if isinstance(key, tuple) and len(key) == 2:
             a, b = key
             key = range(a, b+1)
-        if key in self:
-            old_key = self.get_key(key)
-            assert key == old_key
+        # Building the index for every new key would make filling the dict 
+        # very slow, so the check for an existing key only uses the index if 
+        # it is already valid
+        found = self._find(key, build=False)
+        if found is not None:
+            assert key == found[0]
         super().__setitem__(key, value)
+        self._index = None
+
+    def __delitem__(self, key):
+        super().__delitem__(key)
+        self._index = None
 
     def __getitem__(self, match_key):
-        for key, value in self.items():
-            if isinstance(key, range):
-                if match_key in key:
-                    return value
-            elif match_key == key:
-                return value
-        raise KeyError
+        found = self._find(match_key)
+        if found is None:
+            return self.__missing__(match_key)
+        return found[1]
 
-    def __len__(self):
-        keylen = 0
-        for key in self:
-            if isinstance(key, range):
-                keylen += len(key)
-            else:
-                keylen += 1
+    def __missing__(self, key):
+        raise KeyError(key)
 
-        return keylen
+    def __len__(self):
+        return self._get_index().length
 
     def __contains__(self, match_key):
-        for key, value in self.items():
-            if isinstance(key, range):
-                if match_key in key:
-                    return True
-            elif match_key == key:
-                return True
-        return False
+        return self._find(match_key) is not None
 
     def get_key(self, match_key):
         # Special function for this object: allow a way to retrieve the key that 
         # matches, useful when determining if a value is in the dict because of 
         # a value or a range
-        for key, value in self.items():
-            if isinstance(key, range):
-                if match_key in key:
-                    return key
-            elif match_key == key:
-                return key
+        found = self._find(match_key)
+        if found is not None:
+            return found[0]
 
     def min(self):
-        cur_min = None
-        for key in self:
-            if isinstance(key, range):
-                key_val = key.start
-            else:
-                key_val = key
-
-            if not cur_min:
-                cur_min = key_val
-            elif key_val < cur_min:
-                cur_min = key_val
-        return cur_min
+        return self._get_index().min
 
     def max(self):
-        cur_max = None
-        for key in self:
-            if isinstance(key, range):
-                key_val = key.stop - 1
-            else:
-                key_val = key
+        return self._get_index().max
+
+    # The other methods that modify the dict also have to discard the index
+
+    def clear(self):
+        super().clear()
+        self._index = None
+
+    def pop(self, *args):
+        value = super().pop(*args)
+        self._index = None
+        return value
+
+    def popitem(self):
+        item = super().popitem()
+        self._index = None
+        return item
+
+    def setdefault(self, key, default=None):
+        value = super().setdefault(key, default)
+        self._index = None
+        return value
+
+    def update(self, *args, **kwargs):
+        super().update(*args, **kwargs)
+        self._index = None
 
-            if not cur_max:
-                cur_max = key_val
-            elif key_val > cur_max:
-                cur_max = key_val
-        return cur_max
+    def __ior__(self, other):
+        self.update(other)
+        return self
 
 
 class DefaultRangeDict(RangeDict):
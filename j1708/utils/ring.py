@@ -0,0 +1,118 @@
+import collections
+import enum
+import threading
+
+
+class OverflowPolicy(enum.Enum):
+    # Wait for the consumer to make room
+    BLOCK       = 'block'
+    # Discard the oldest item to make room for the new one
+    DROP_OLDEST = 'drop-oldest'
+    # Discard the new item
+    DROP_NEWEST = 'drop-newest'
+
+
+class RingBuffer:
+    """
+    Fixed capacity FIFO used to pass items from a producer thread to
+    a consumer thread.  What happens when an item is added to a full buffer is
+    controlled by the overflow policy.
+
+    Counters:
+        received:   number of items offered to the buffer (including dropped)
+        dropped:    number of items discarded because the buffer was full
+        high_water: the largest number of items that have been waiting
+    """
+    def __init__(self, capacity, policy=OverflowPolicy.DROP_OLDEST):
+        if capacity < 1:
+            raise ValueError(f'Invalid ring buffer capacity {capacity}')
+
+        self.capacity = capacity
+        self.policy = OverflowPolicy(policy)
+
+        self._items = collections.deque()
+        self._lock = threading.Lock()
+        self._not_empty = threading.Condition(self._lock)
+        self._not_full = threading.Condition(self._lock)
+        self._closed = False
+
+        self.received = 0
+        self.dropped = 0
+        self.high_water = 0
+
+    def __len__(self):
+        return len(self._items)
+
+    @property
+    def closed(self):
+        return self._closed
+
+    def put(self, item):
+        """
+        Add an item to the buffer.  Returns False if the item was not added
+        because it was dropped or the buffer has been closed.
+        """
+        with self._lock:
+            if self._closed:
+                return False
+
+            self.received += 1
+            if len(self._items) >= self.capacity:
+                if self.policy is OverflowPolicy.BLOCK:
+                    while len(self._items) >= self.capacity and not self._closed:
+                        self._not_full.wait()
+                    if self._closed:
+                        return False
+                elif self.policy is OverflowPolicy.DROP_OLDEST:
+                    self._items.popleft()
+                    self.dropped += 1
+                else:
+                    self.dropped += 1
+                    return False
+
+            self._items.append(item)
+            if len(self._items) > self.high_water:
+                self.high_water = len(self._items)
+
+            self._not_empty.notify()
+            return True
+
+    def get(self, timeout=None):
+        """
+        Remove and return the oldest item, waiting up to timeout seconds (or
+        forever if timeout is None) for one to be available.  Returns None if
+        the timeout expires or the buffer is closed and empty.
+        """
+        with self._lock:
+            if not self._not_empty.wait_for(lambda: self._items or self._closed, timeout):
+                return None
+            if not self._items:
+                return None
+
+            item = self._items.popleft()
+            self._not_full.notify()
+            return item
+
+    def close(self):
+        """
+        Wake up any waiting threads.  Items already in the buffer can still be
+        retrieved.
+        """
+        with self._lock:
+            self._closed = True
+            self._not_empty.notify_all()
+            self._not_full.notify_all()
+
+    def stats(self):
+        return {
+            'received': self.received,
+            'dropped': self.dropped,
+            'high_water': self.high_water,
+            'pending': len(self._items),
+        }
+
+
+__all__ = [
+    'OverflowPolicy',
+    'RingBuffer',
+]
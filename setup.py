@@ -10,13 +10,20 @@ with open('requirements.txt') as f:
 setup(
     name='j1708',
     packages=find_packages(),
+    # Built with "make metadata", optional
+    package_data={'j1708': ['metadata.bin']},
     entry_points={
         'console_scripts': [
             'j1708dump=j1708.cli.dump:main',
             'j1708sniff=j1708.cli.sniff:main',
+            'j1708emu=j1708.cli.emulate:main',
         ],
     },
     install_requires=required,
+    extras_require={
+        # Needed by j1708.batch
+        'batch': ['numpy'],
+    },
     version=__version__ ,
     python_requires='>=3.8',
 )